@@ -5,10 +5,27 @@ const ClusteringResult = require('../models/ClusteringResult');
 
 const ML_SERVICE_URL = process.env.ML_SERVICE_URL || 'http://localhost:5001';
 
+// Plots rendered on demand by the ML service for a stored clustering result
+const RESULT_PLOT_NAMES = ['clusters_2d', 'feature_distributions', 'cluster_profiles', 'correlation_heatmap'];
+
+// Fetched one at a time: the ML service renders in-process plots serially anyway
+const fetchResultPlots = async (mlResultId) => {
+  const plots = {};
+  for (const name of RESULT_PLOT_NAMES) {
+    try {
+      const response = await axios.get(`${ML_SERVICE_URL}/api/visualizations/${mlResultId}/${name}`);
+      plots[name] = response.data.image;
+    } catch (error) {
+      // Missing plots (e.g. the ML result expired) are left out
+    }
+  }
+  return plots;
+};
+
 // Run clustering analysis
 exports.runClustering = async (req, res) => {
   try {
-    const { algorithm = 'kmeans', params = {} } = req.body;
+    const { algorithm = 'kmeans', params = {}, warm_start = false } = req.body;
 
     // Get all customers from database
     const customers = await Customer.find({}).lean();
@@ -33,19 +50,35 @@ exports.runClustering = async (req, res) => {
     const mlResponse = await axios.post(`${ML_SERVICE_URL}/api/cluster`, {
       customers: customerData,
       algorithm,
-      params
+      params,
+      warm_start,
+      response_mode: 'compact'
     });
 
     const mlData = mlResponse.data;
 
+    // Assignments stored by the previous run, needed to apply a warm-start diff
+    const previousResult = await ClusteringResult.findOne({ Status: 'completed' })
+      .sort({ createdAt: -1 })
+      .lean();
+    const previousLabels = new Map(
+      (await Cluster.find({}).lean()).map(cluster => [cluster.ClusterID, cluster.Label])
+    );
+
+    // Plots are rendered lazily: getVisualizations fetches them via MLResultID
+    const visualizations = mlData.visualizations || {};
+
     // Save clustering result
     const clusteringResult = await ClusteringResult.create({
       Algorithm: algorithm,
       Parameters: params,
       Metrics: mlData.metrics,
-      Visualizations: mlData.visualizations,
+      MLResultID: mlData.result_id,
+      Visualizations: visualizations,
       FeatureNames: mlData.feature_names,
       PCAVarianceExplained: mlData.pca_variance_explained,
+      MLModelVersion: mlData.model_version,
+      Stability: mlData.stability,
       Status: 'completed'
     });
 
@@ -69,20 +102,53 @@ exports.runClustering = async (req, res) => {
     clusteringResult.ClusterProfiles = clusterProfiles;
     await clusteringResult.save();
 
-    // Update customer cluster assignments
-    const bulkOps = mlData.customers_with_clusters.map(customer => ({
-      updateOne: {
-        filter: { CustomerID: customer.CustomerID },
-        update: {
-          $set: {
-            ClusterID: customer.ClusterID,
-            ClusterLabel: customer.ClusterLabel
-          }
+    // A warm-started run reports the customers whose cluster changed since the
+    // model it was seeded from; when that model is the one whose assignments are
+    // stored, only those customers (and relabeled clusters) need writing
+    const incremental = Boolean(
+      mlData.changed_customer_ids &&
+      mlData.warm_start?.baseline_version &&
+      previousResult?.Algorithm === algorithm &&
+      previousResult?.MLModelVersion === mlData.warm_start.baseline_version
+    );
+
+    const bulkOps = [];
+    let assignmentIds = mlData.customer_ids.map((_, idx) => idx);
+    if (incremental) {
+      for (const [clusterId, label] of Object.entries(mlData.cluster_labels)) {
+        if (previousLabels.get(Number(clusterId)) !== label) {
+          bulkOps.push({
+            updateMany: {
+              filter: { ClusterID: Number(clusterId) },
+              update: { $set: { ClusterLabel: label } }
+            }
+          });
         }
       }
-    }));
 
-    await Customer.bulkWrite(bulkOps);
+      const changed = new Set(mlData.changed_customer_ids);
+      assignmentIds = assignmentIds.filter(idx => changed.has(mlData.customer_ids[idx]));
+    }
+
+    // Update customer cluster assignments (compact response: parallel ID arrays)
+    for (const idx of assignmentIds) {
+      const clusterId = mlData.cluster_ids[idx];
+      bulkOps.push({
+        updateOne: {
+          filter: { CustomerID: mlData.customer_ids[idx] },
+          update: {
+            $set: {
+              ClusterID: clusterId,
+              ClusterLabel: mlData.cluster_labels[String(clusterId)] || 'Noise'
+            }
+          }
+        }
+      });
+    }
+
+    if (bulkOps.length > 0) {
+      await Customer.bulkWrite(bulkOps);
+    }
 
     res.json({
       success: true,
@@ -91,8 +157,11 @@ exports.runClustering = async (req, res) => {
         algorithm,
         metrics: mlData.metrics,
         cluster_profiles: mlData.cluster_profiles,
-        visualizations: mlData.visualizations,
-        n_clusters: mlData.n_clusters
+        visualizations,
+        n_clusters: mlData.n_clusters,
+        warm_start: mlData.warm_start,
+        stability: mlData.stability,
+        updated_customers: assignmentIds.length
       }
     });
 
@@ -231,6 +300,18 @@ exports.getVisualizations = async (req, res) => {
       });
     }
 
+    // First request for a result's plots: render them through the ML service
+    // and keep them with the result
+    const stored = result.toObject().Visualizations || {};
+    const missing = RESULT_PLOT_NAMES.some(name => !stored[name]);
+    if (missing && result.MLResultID) {
+      const plots = await fetchResultPlots(result.MLResultID);
+      if (Object.keys(plots).length > 0) {
+        result.Visualizations = { ...stored, ...plots };
+        await result.save();
+      }
+    }
+
     res.json({
       success: true,
       data: {
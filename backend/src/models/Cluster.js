@@ -39,7 +39,7 @@ const clusterSchema = new mongoose.Schema({
   // Metadata about clustering run
   Algorithm: {
     type: String,
-    enum: ['kmeans', 'hierarchical', 'dbscan'],
+    enum: ['kmeans', 'minibatch_kmeans', 'hierarchical', 'dbscan'],
     required: true
   },
   CreatedAt: {
@@ -3,7 +3,7 @@ const mongoose = require('mongoose');
 const clusteringResultSchema = new mongoose.Schema({
   Algorithm: {
     type: String,
-    enum: ['kmeans', 'hierarchical', 'dbscan'],
+    enum: ['kmeans', 'minibatch_kmeans', 'hierarchical', 'dbscan'],
     required: true
   },
   Parameters: {
@@ -17,8 +17,15 @@ const clusteringResultSchema = new mongoose.Schema({
     calinski_harabasz_score: Number,
     n_clusters: Number,
     n_samples: Number,
-    n_noise_points: Number
+    n_noise_points: Number,
+    silhouette_ci: [Number],
+    silhouette_sample_size: Number,
+    metric_modes: mongoose.Schema.Types.Mixed
   },
+  MLResultID: String,
+  // Version of the model artifact the ML service saved for this run
+  MLModelVersion: String,
+  Stability: mongoose.Schema.Types.Mixed,
   ClusterProfiles: [{
     type: mongoose.Schema.Types.ObjectId,
     ref: 'Cluster'
@@ -19,8 +19,18 @@ function ClusterAnalysis() {
     setLoading(true);
     try {
       const response = await clusteringAPI.runClustering(algorithm, params);
-      setResults(response.data.data);
+      const data = response.data.data;
+      setResults(data);
       alert('✅ Clustering completed successfully!');
+
+      // Plots are rendered on demand once the results are shown
+      clusteringAPI.getVisualizations(data.result_id)
+        .then(plots => setResults(current => (
+          current?.result_id === data.result_id
+            ? { ...current, visualizations: plots.data.data.visualizations }
+            : current
+        )))
+        .catch(() => {});
     } catch (err) {
       alert('❌ Error: ' + (err.response?.data?.error || err.message));
     } finally {
@@ -58,12 +68,13 @@ function ClusterAnalysis() {
               onChange={(e) => setAlgorithm(e.target.value)}
             >
               <option value="kmeans">K-Means</option>
+              <option value="minibatch_kmeans">Mini-Batch K-Means</option>
               <option value="hierarchical">Hierarchical</option>
               <option value="dbscan">DBSCAN</option>
             </select>
           </div>
 
-          {algorithm === 'kmeans' && (
+          {(algorithm === 'kmeans' || algorithm === 'minibatch_kmeans') && (
             <>
               <div className="input-group">
                 <label>Number of Clusters (K)</label>
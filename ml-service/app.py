@@ -4,27 +4,160 @@ import pandas as pd
 import numpy as np
 import os
 import sys
+import json
+import time
+import uuid
+import base64
+import contextlib
+import atexit
+import threading
 
+import artifacts
 from preprocessing import DataPreprocessor
-from clustering import CustomerSegmentation
-from visualization import ClusterVisualizer
+from clustering import CustomerSegmentation, profile_quantiles
+from assignment import assignment_changes, assignment_confidence
+from visualization import ClusterVisualizer, PlotRenderPool, PLOT_2D_MODES, RESULT_PLOT_NAMES
+from model_registry import ModelRegistry
+from neighbors import NeighborGraphCache
+from cache import LRUCache, ResultCache, hash_arrays, hash_dataframe
+from columnar import NPZ_MIMETYPE, JSON_MIMETYPE, encode_npz, decode_npz
+from jobs import JobManager, QueueFull
+from rfm_store import RFMStore
+from stage_memory import StageMemoryTracker
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
-# Global objects
-preprocessor = DataPreprocessor()
-segmentation = CustomerSegmentation()
+# Spawned worker processes (plot rendering, elbow sweeps) re-import this module
+# as __mp_main__ when the service is started with `python app.py`. Workers only
+# run functions from other modules, so they skip the process-wide state below:
+# on-disk snapshots and caches, job threads and exit hooks.
+SERVICE_PROCESS = __name__ != '__mp_main__'
+
+# Global objects (preprocessors and segmentations are created per request,
+# since fitting stores state on them)
+neighbor_cache = NeighborGraphCache()
 visualizer = ClusterVisualizer()
 
 # File paths
 DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
 MODELS_DIR = os.path.join(DATA_DIR, 'models')
-os.makedirs(MODELS_DIR, exist_ok=True)
+if SERVICE_PROCESS:
+    os.makedirs(MODELS_DIR, exist_ok=True)
+
+# Fitted models kept in memory between prediction requests
+model_registry = ModelRegistry(MODELS_DIR)
+
+# Per-customer RFM state updated incrementally from transaction batches,
+# snapshotted under data/rfm and memory-mapped back in on startup
+RFM_DIR = os.path.join(DATA_DIR, 'rfm')
+rfm_store = RFMStore.load_or_create(RFM_DIR) if SERVICE_PROCESS else None
+_rfm_save_lock = threading.Lock()
+
+def save_rfm_snapshot():
+    with _rfm_save_lock:
+        if rfm_store.dirty:
+            rfm_store.save(RFM_DIR)
+
+if SERVICE_PROCESS:
+    atexit.register(save_rfm_snapshot)
+
+# Clustering results kept for on-demand plot rendering, and the rendered
+# plots themselves (base64 PNG strings) keyed by content hash
+result_store = LRUCache(
+    max_bytes=512 * 1024 * 1024,
+    sizeof=lambda entry: entry['X'].nbytes + entry['labels'].nbytes + entry['X_reduced'].nbytes
+)
+plot_cache = LRUCache(max_bytes=128 * 1024 * 1024, sizeof=lambda plot: len(plot['image']))
+
+def _cached_result_size(value):
+    """Approximate bytes held by a cached /api/cluster or /api/elbow result."""
+    size = len(json.dumps(value['response'], default=str))
+    for df in list(value.get('tables', {}).values()) + list(value.get('columns', {}).values()):
+        size += int(df.memory_usage(index=False, deep=True).sum())
+    if value.get('result') is not None:
+        size += result_store.sizeof(value['result'])
+    return size
+
+def _cached_result_valid(value):
+    """A cached clustering result is stale once its saved model has been replaced."""
+    if value.get('algorithm') is None:
+        return True
+    return model_registry.current_version(value['algorithm']) == value['model_version']
+
+# Complete responses for repeated identical /api/cluster and /api/elbow requests,
+# keyed by a content hash of the customers plus the request options.
+# RESULT_CACHE_PERSIST=1 also keeps them on disk under data/result_cache.
+result_cache = ResultCache(
+    max_bytes=int(os.environ.get('RESULT_CACHE_MB', 256)) * 1024 * 1024,
+    sizeof=_cached_result_size,
+    cache_dir=(os.path.join(DATA_DIR, 'result_cache')
+               if SERVICE_PROCESS and os.environ.get('RESULT_CACHE_PERSIST', '0') == '1' else None),
+    validate=_cached_result_valid
+)
+
+# Worker processes for rendering summary plots concurrently (0 disables the pool,
+# which is the default on single-core machines where it cannot help)
+_cpu_count = os.cpu_count() or 1
+PLOT_RENDER_WORKERS = int(os.environ.get('PLOT_RENDER_WORKERS', min(5, _cpu_count) if _cpu_count > 1 else 0))
+_render_pool = None
+_render_pool_lock = threading.Lock()
+
+# pyplot keeps global state (current figure, tight_layout), so figures
+# rendered in this process by concurrent request threads are serialized
+_pyplot_lock = threading.Lock()
+
+def get_render_pool():
+    """
+    Create the plot render pool on first use, so processes that never
+    render summary plots do not start workers.
+    """
+    global _render_pool
+    if PLOT_RENDER_WORKERS <= 0:
+        return None
+    with _render_pool_lock:
+        if _render_pool is None:
+            _render_pool = PlotRenderPool(n_workers=PLOT_RENDER_WORKERS)
+            atexit.register(_render_pool.close)
+    return _render_pool
 
 
 
 
+def read_customers_request(table='customers'):
+    """
+    Parse a request carrying customers (or another table) as either JSON
+    records or a columnar NPZ body (Content-Type: application/x-npz).
+    Returns (options dict, DataFrame or None).
+    """
+    if request.mimetype == NPZ_MIMETYPE:
+        options, tables = decode_npz(request.get_data())
+        return options, tables.get(table)
+    
+    data = request.json
+    records = data.get(table, [])
+    return data, pd.DataFrame(records) if records else None
+
+def make_payload_response(payload, tables=None, columns=None, status=200):
+    """
+    Respond with JSON, or with a columnar NPZ body when the client accepts
+    application/x-npz. tables ({name: DataFrame}) become record lists in JSON;
+    columns ({name: DataFrame}) become top-level parallel arrays in JSON.
+    Both are sent as typed column arrays in NPZ.
+    """
+    tables = tables or {}
+    columns = columns or {}
+    if request.accept_mimetypes.best_match([JSON_MIMETYPE, NPZ_MIMETYPE]) == NPZ_MIMETYPE:
+        return app.response_class(encode_npz(payload, {**tables, **columns}), status=status,
+                                  mimetype=NPZ_MIMETYPE)
+    
+    for name, df in tables.items():
+        payload[name] = df.to_dict('records')
+    for df in columns.values():
+        for column in df.columns:
+            payload[column] = df[column].tolist()
+    return jsonify(payload), status
+
 @app.route("/")
 def home():
     return {
@@ -49,117 +182,503 @@ def health_check():
 def compute_elbow():
     """Compute elbow method for K-Means."""
     try:
-        data = request.json
-        customers_data = data.get('customers', [])
+        data, df = read_customers_request()
         k_min = data.get('k_min', 2)
         k_max = data.get('k_max', 11)
+        n_jobs = data.get('n_jobs', 1)
+        warm_start = data.get('warm_start', False)
+        early_stop_tol = data.get('early_stop_tol')
+        metrics_mode = data.get('metrics_mode', 'auto')
         
-        if not customers_data:
+        if df is None or len(df) == 0:
             return jsonify({'error': 'No customer data provided'}), 400
         
+        cache_key = hash_dataframe(
+            df, endpoint='elbow', k_min=k_min, k_max=k_max, warm_start=warm_start,
+            early_stop_tol=early_stop_tol, metrics_mode=metrics_mode
+        )
+        if data.get('use_cache', True):
+            cached = result_cache.get(cache_key)
+            if cached is not None:
+                return make_payload_response({**cached['response'], 'cached': True})
+        
         # Preprocess data
-        df = pd.DataFrame(customers_data)
-        X, feature_names, customer_ids = preprocessor.prepare_for_clustering(df)
+        X, feature_names, customer_ids = DataPreprocessor().prepare_for_clustering(df)
         
         # Compute elbow
-        elbow_data = segmentation.elbow_method(X, k_range=range(k_min, k_max))
+        segmentation = CustomerSegmentation(metrics_mode=metrics_mode)
+        elbow_data = segmentation.elbow_method(
+            X, k_range=range(k_min, k_max),
+            n_jobs=n_jobs, warm_start=warm_start, early_stop_tol=early_stop_tol
+        )
         
         # Generate visualization
-        elbow_plot = visualizer.plot_elbow_curve(elbow_data)
+        with _pyplot_lock:
+            elbow_plot = visualizer.plot_elbow_curve(elbow_data)
         
-        return jsonify({
+        response = {
             'elbow_data': elbow_data,
             'elbow_plot': elbow_plot,
             'feature_names': feature_names
-        }), 200
+        }
+        result_cache.put(cache_key, {'response': response})
+        
+        return make_payload_response({**response, 'cached': False})
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+CLUSTERING_ALGORITHMS = ['kmeans', 'minibatch_kmeans', 'hierarchical', 'dbscan']
+
+# Seconds /api/visualizations may spend fitting a t-SNE embedding by default
+DEFAULT_EMBEDDING_TIME_BUDGET = 30
+
+# Feature matrix dtype for clustering runs; float32 roughly halves peak memory
+FEATURE_DTYPES = ['float64', 'float32']
+DEFAULT_FEATURE_DTYPE = os.environ.get('FEATURE_DTYPE', 'float64')
+
+# Serializes writes of the saved model/preprocessor pair between concurrent runs
+_model_save_lock = threading.Lock()
+
+def _no_progress(stage):
+    pass
+
+def run_clustering_pipeline(df, data, progress=_no_progress):
+    """
+    Run preprocessing, clustering, profiling and (optionally) plotting for a
+    customers DataFrame with /api/cluster options. Each run uses its own
+    preprocessor and segmentation objects, so runs may overlap.
+    progress(stage) is called on entering each stage. dtype ('float64' or
+    'float32') sets the feature matrix precision for every stage, and
+    profile_memory adds the peak traced memory of each stage to the response.
+    Identical requests are answered from result_cache unless use_cache is false.
+    warm_start (kmeans only) seeds the fit from the saved kmeans model and
+    reports which customers changed cluster (see _warm_start_baseline).
+    Returns (response dict, tables, columns) for make_payload_response.
+    """
+    algorithm = data.get('algorithm', 'kmeans')
+    params = data.get('params', {})
+    metrics_mode = data.get('metrics_mode', 'auto')
+    profile_stats = data.get('profile_stats', [])
+    render_plots = data.get('render_plots', False)
+    response_mode = data.get('response_mode', 'full')
+    dtype = data.get('dtype', DEFAULT_FEATURE_DTYPE)
+    profile_memory = data.get('profile_memory', False)
+    # A warm-started result depends on the model it was seeded from
+    warm_start_version = (model_registry.current_version('kmeans')
+                          if algorithm == 'kmeans' and data.get('warm_start', False) else None)
+    
+    cache_key = hash_dataframe(
+        df, endpoint='cluster', algorithm=algorithm, params=params, metrics_mode=metrics_mode,
+        profile_stats=profile_stats, render_plots=render_plots, response_mode=response_mode,
+        dtype=dtype, profile_memory=profile_memory,
+        projection_method=data.get('projection_method', 'auto'),
+        warm_start=data.get('warm_start', False), warm_start_version=warm_start_version
+    )
+    if data.get('use_cache', True):
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            # Plots stay renderable on demand even if the result store evicted it
+            result_id = cached['response']['result_id']
+            if result_id not in result_store:
+                result_store.put(result_id, cached['result'])
+            return {**cached['response'], 'cached': True}, cached['tables'], cached['columns']
+    
+    memory_tracker = StageMemoryTracker() if profile_memory else None
+    
+    def stage(name):
+        if memory_tracker is not None:
+            memory_tracker.enter(name)
+        progress(name)
+    
+    run_preprocessor = DataPreprocessor(dtype=dtype)
+    run_segmentation = CustomerSegmentation(
+        metrics_mode=metrics_mode, neighbor_cache=neighbor_cache, on_stage=stage
+    )
+    
+    try:
+        return _run_stages(df, data, cache_key, run_preprocessor, run_segmentation, stage,
+                           memory_tracker)
+    finally:
+        if memory_tracker is not None:
+            memory_tracker.finish()
+
+def _warm_start_baseline(preprocessor, n_clusters):
+    """
+    The saved kmeans model to seed a warm start from, with its centers mapped
+    into the feature space of the freshly fitted preprocessor.
+    Returns (baseline dict or None, reason when there is none).
+    """
+    try:
+        segmentation, saved_preprocessor, version = model_registry.get('kmeans')
+    except FileNotFoundError:
+        return None, 'no saved kmeans model'
+    except Exception as e:
+        # e.g. a pickle written by an incompatible numpy/sklearn version
+        return None, f'saved kmeans model could not be loaded: {e}'
+    
+    if segmentation.cluster_centers is None or len(segmentation.cluster_centers) != n_clusters:
+        return None, 'saved model has a different number of clusters'
+    try:
+        centers = preprocessor.convert_scaled(segmentation.cluster_centers, saved_preprocessor)
+    except ValueError:
+        return None, 'saved model uses different features'
+    
+    return {
+        'centers': centers,
+        'segmentation': segmentation,
+        'version': version[1] if version[0] == 'artifact' else None
+    }, None
+
+def _run_stages(df, data, cache_key, run_preprocessor, run_segmentation, stage, memory_tracker):
+    algorithm = data.get('algorithm', 'kmeans')
+    params = data.get('params', {})
+    profile_stats = data.get('profile_stats', [])
+    render_plots = data.get('render_plots', False)
+    response_mode = data.get('response_mode', 'full')
+    
+    # Preprocess data
+    stage('preprocess')
+    X, feature_names, customer_ids = run_preprocessor.prepare_for_clustering(df)
+    
+    # Perform clustering based on algorithm
+    stage('fit')
+    baseline = None
+    if algorithm == 'kmeans':
+        n_clusters = params.get('n_clusters', 5)
+        if data.get('warm_start', False):
+            baseline, reason = _warm_start_baseline(run_preprocessor, n_clusters)
+        if baseline is not None:
+            labels = run_segmentation.fit_kmeans_warm_start(
+                X, baseline['centers'], max_center_shift=params.get('max_center_shift', 0.5)
+            )
+        else:
+            labels = run_segmentation.fit_kmeans(X, n_clusters=n_clusters)
+    elif algorithm == 'minibatch_kmeans':
+        n_clusters = params.get('n_clusters', 5)
+        batch_size = params.get('batch_size', 1024)
+        n_passes = params.get('n_passes', 10)
+        labels = run_segmentation.fit_minibatch_kmeans(
+            X, n_clusters=n_clusters, batch_size=batch_size, n_passes=n_passes
+        )
+    elif algorithm == 'hierarchical':
+        n_clusters = params.get('n_clusters', 5)
+        linkage = params.get('linkage', 'ward')
+        method = params.get('method', 'auto')
+        memory_budget_mb = params.get('memory_budget_mb')
+        labels = run_segmentation.fit_hierarchical(
+            X, n_clusters=n_clusters, linkage=linkage,
+            method=method, memory_budget_mb=memory_budget_mb
+        )
+    elif algorithm == 'dbscan':
+        eps = params.get('eps', 0.5)
+        min_samples = params.get('min_samples', 5)
+        labels = run_segmentation.fit_dbscan(X, eps=eps, min_samples=min_samples)
+    else:
+        raise ValueError(f'Unknown algorithm: {algorithm}')
+    run_segmentation.customer_ids = customer_ids
+    
+    # Profile clusters
+    stage('profile')
+    profiles_df = run_segmentation.profile_clusters(X, feature_names, extra_stats=profile_stats)
+    
+    # Dimensionality reduction for visualization; the fitted basis is saved
+    # with the preprocessor so later projections are a matrix multiply
+    X_pca, variance_explained = run_preprocessor.reduce_dimensions_pca(
+        X, n_components=2, method=data.get('projection_method', 'auto')
+    )
+    
+    # Keep the result so plots can be rendered later on demand
+    result_id = uuid.uuid4().hex
+    result_entry = {
+        'X': X,
+        'labels': labels,
+        'feature_names': feature_names,
+        'X_reduced': X_pca,
+        'profiles_df': profiles_df,
+        'data_hash': hash_arrays(X, labels, X_pca, feature_names=feature_names)
+    }
+    result_store.put(result_id, result_entry)
+    
+    # Generate visualizations (only when explicitly requested)
+    plots = {}
+    render_info = {}
+    if render_plots:
+        stage('plots')
+        render_pool = get_render_pool()
+        with _pyplot_lock if render_pool is None else contextlib.nullcontext():
+            plots = visualizer.generate_summary_plots(
+                X, labels, feature_names, 
+                X_reduced=X_pca, 
+                profiles_df=profiles_df,
+                render_info=render_info,
+                render_pool=render_pool
+            )
+    
+    # Map cluster labels
+    label_mapping = dict(zip(profiles_df['ClusterID'], profiles_df['Label']))
+    
+    if response_mode == 'compact':
+        # Parallel ID arrays plus a small label dictionary instead of full records
+        if -1 in labels:
+            label_mapping[-1] = 'Noise'
+        tables = {}
+        columns = {'assignments': pd.DataFrame({
+            'customer_ids': customer_ids if customer_ids is not None else np.arange(len(labels)),
+            'cluster_ids': labels.astype(int)
+        })}
+    else:
+        # Prepare response
+        result_df = df.copy()
+        result_df['ClusterID'] = labels.astype(int)
+        result_df['ClusterLabel'] = result_df['ClusterID'].map(label_mapping)
+        result_df['ClusterLabel'] = result_df['ClusterLabel'].fillna('Noise')
+        tables = {'customers_with_clusters': result_df}
+        columns = {}
+    
+    response = {
+        'response_mode': response_mode,
+        'result_id': result_id,
+        'algorithm': algorithm,
+        'metrics': run_segmentation.metrics,
+        'cluster_profiles': profiles_df.to_dict('records'),
+        'visualizations': plots,
+        'render_info': render_info,
+        'visualization_urls': {
+            name: f'/api/visualizations/{result_id}/{name}' for name in RESULT_PLOT_NAMES
+        },
+        'feature_names': feature_names,
+        'pca_variance_explained': variance_explained.tolist(),
+        'pca_method': run_preprocessor.projection['method'],
+        'n_clusters': len(set(labels)) - (1 if -1 in labels else 0)
+    }
+    if response_mode == 'compact':
+        response['cluster_labels'] = {str(int(k)): v for k, v in label_mapping.items()}
+    response['feature_dtype'] = str(X.dtype)
+    
+    if data.get('warm_start', False) and algorithm == 'kmeans':
+        if baseline is None:
+            response['warm_start'] = {'used': False, 'reason': reason}
+        else:
+            response['warm_start'] = {**run_segmentation.warm_start_info,
+                                      'baseline_version': baseline['version']}
+            # Cluster-ID stability against the seeding model, by CustomerID
+            previous = baseline['segmentation']
+            if (customer_ids is not None and previous.customer_ids is not None
+                    and previous.labels is not None):
+                counts, changed = assignment_changes(previous.customer_ids, previous.labels,
+                                                     customer_ids, labels)
+                response['stability'] = counts
+                response['changed_customer_ids'] = customer_ids[changed].tolist()
+    
+    # Save model
+    stage('save')
+    with _model_save_lock:
+        model_version = model_registry.save(algorithm, run_segmentation, run_preprocessor)
+    response['model_version'] = model_version[1]
+    
+    if memory_tracker is not None:
+        response['memory_profile'] = memory_tracker.finish()
+    
+    result_cache.put(cache_key, {
+        'algorithm': algorithm,
+        'model_version': model_version,
+        'response': response,
+        'tables': tables,
+        'columns': columns,
+        'result': result_entry
+    })
+    
+    return {**response, 'cached': False}, tables, columns
+
+def _run_cluster_job(payload, progress):
+    df, data = payload
+    return run_clustering_pipeline(df, data, progress)
+
+# Background clustering jobs (POST /api/jobs/cluster); past max_pending
+# queued or running jobs new submissions are rejected with 503
+job_manager = None
+if SERVICE_PROCESS:
+    job_manager = JobManager(
+        _run_cluster_job,
+        max_workers=int(os.environ.get('CLUSTER_JOB_WORKERS', 1)),
+        max_pending=int(os.environ.get('CLUSTER_JOB_QUEUE_DEPTH', 8)),
+        result_sizeof=lambda result: _cached_result_size(
+            {'response': result[0], 'tables': result[1], 'columns': result[2]}),
+        max_result_bytes=int(os.environ.get('CLUSTER_JOB_RESULTS_MB', 256)) * 1024 * 1024,
+        result_ttl=int(os.environ.get('CLUSTER_JOB_RESULT_TTL', 900))
+    )
+    atexit.register(job_manager.shutdown)
+
 @app.route('/api/cluster', methods=['POST'])
 def perform_clustering():
     """Perform clustering analysis."""
     try:
-        data = request.json
-        customers_data = data.get('customers', [])
+        data, df = read_customers_request()
         algorithm = data.get('algorithm', 'kmeans')
-        params = data.get('params', {})
         
-        if not customers_data:
+        if df is None or len(df) == 0:
             return jsonify({'error': 'No customer data provided'}), 400
+        if algorithm not in CLUSTERING_ALGORITHMS:
+            return jsonify({'error': f'Unknown algorithm: {algorithm}'}), 400
+        if data.get('dtype', DEFAULT_FEATURE_DTYPE) not in FEATURE_DTYPES:
+            return jsonify({'error': f"dtype must be one of {FEATURE_DTYPES}"}), 400
+        try:
+            profile_quantiles(data.get('profile_stats', []))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        # Preprocess data
-        df = pd.DataFrame(customers_data)
-        X, feature_names, customer_ids = preprocessor.prepare_for_clustering(df)
-        
-        # Perform clustering based on algorithm
-        if algorithm == 'kmeans':
-            n_clusters = params.get('n_clusters', 5)
-            labels = segmentation.fit_kmeans(X, n_clusters=n_clusters)
-        elif algorithm == 'hierarchical':
-            n_clusters = params.get('n_clusters', 5)
-            linkage = params.get('linkage', 'ward')
-            labels = segmentation.fit_hierarchical(X, n_clusters=n_clusters, linkage=linkage)
-        elif algorithm == 'dbscan':
-            eps = params.get('eps', 0.5)
-            min_samples = params.get('min_samples', 5)
-            labels = segmentation.fit_dbscan(X, eps=eps, min_samples=min_samples)
-        else:
+        response, tables, columns = run_clustering_pipeline(df, data)
+        return make_payload_response(response, tables=tables, columns=columns)
+        
+    except Exception as e:
+        import traceback
+        return jsonify({
+            'error': str(e),
+            'traceback': traceback.format_exc()
+        }), 500
+
+@app.route('/api/jobs/cluster', methods=['POST'])
+def submit_clustering_job():
+    """Queue a clustering run (same options as /api/cluster) and return its job ID."""
+    try:
+        data, df = read_customers_request()
+        algorithm = data.get('algorithm', 'kmeans')
+        
+        if df is None or len(df) == 0:
+            return jsonify({'error': 'No customer data provided'}), 400
+        if algorithm not in CLUSTERING_ALGORITHMS:
             return jsonify({'error': f'Unknown algorithm: {algorithm}'}), 400
+        if data.get('dtype', DEFAULT_FEATURE_DTYPE) not in FEATURE_DTYPES:
+            return jsonify({'error': f"dtype must be one of {FEATURE_DTYPES}"}), 400
+        try:
+            profile_quantiles(data.get('profile_stats', []))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        try:
+            job_id = job_manager.submit((df, data), kind='cluster')
+        except QueueFull as e:
+            response = jsonify({'error': str(e)})
+            response.headers['Retry-After'] = '30'
+            return response, 503
         
-        # Profile clusters
-        profiles_df = segmentation.profile_clusters(X, feature_names)
+        return jsonify({
+            'job_id': job_id,
+            'status': 'queued',
+            'status_url': f'/api/jobs/{job_id}'
+        }), 202
         
-        # Dimensionality reduction for visualization
-        X_pca, variance_explained = preprocessor.reduce_dimensions_pca(X, n_components=2)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Job status: stage (queued/preprocess/fit/metrics/profile/plots/save/done),
+    progress percentage and, once completed, the /api/cluster result
+    (until it expires, after which result_expired is set).
+    """
+    status = job_manager.status(job_id)
+    if status is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    
+    job = job_manager.get(job_id)
+    result = job['result'] if job is not None else None
+    if status['status'] != 'completed' or result is None:
+        return jsonify(status)
+    
+    response, tables, columns = result
+    return make_payload_response({**status, **response}, tables=tables, columns=columns)
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Cancel a queued job, or stop a running one at its next stage."""
+    if job_manager.status(job_id) is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    if not job_manager.cancel(job_id):
+        return jsonify({'error': 'Job already finished', **job_manager.status(job_id)}), 409
+    return jsonify(job_manager.status(job_id)), 202
+
+@app.route('/api/jobs', methods=['GET'])
+def job_stats():
+    """Job counts by status and queue capacity."""
+    return jsonify(job_manager.stats())
+
+@app.route('/api/dbscan/sweep', methods=['POST'])
+def dbscan_sweep():
+    """Cluster and noise counts for several DBSCAN eps values from one OPTICS pass."""
+    try:
+        data = request.json
+        customers_data = data.get('customers', [])
+        eps_values = data.get('eps_values', [0.3, 0.5, 0.7, 1.0])
+        min_samples = data.get('min_samples', 5)
         
-        # Generate visualizations
-        plots = visualizer.generate_summary_plots(
-            X, labels, feature_names, 
-            X_reduced=X_pca, 
-            profiles_df=profiles_df
-        )
+        if not customers_data:
+            return jsonify({'error': 'No customer data provided'}), 400
         
-        # Prepare response
-        result_df = df.copy()
-        result_df['ClusterID'] = labels.astype(int)
+        df = pd.DataFrame(customers_data)
+        X, feature_names, customer_ids = DataPreprocessor().prepare_for_clustering(df)
         
-        # Map cluster labels
-        label_mapping = dict(zip(profiles_df['ClusterID'], profiles_df['Label']))
-        result_df['ClusterLabel'] = result_df['ClusterID'].map(label_mapping)
-        result_df['ClusterLabel'] = result_df['ClusterLabel'].fillna('Noise')
+        return jsonify({
+            'min_samples': min_samples,
+            'results': CustomerSegmentation().dbscan_eps_sweep(X, eps_values, min_samples=min_samples)
+        }), 200
         
-        response = {
-            'algorithm': algorithm,
-            'metrics': segmentation.metrics,
-            'cluster_profiles': profiles_df.to_dict('records'),
-            'customers_with_clusters': result_df.to_dict('records'),
-            'visualizations': plots,
-            'feature_names': feature_names,
-            'pca_variance_explained': variance_explained.tolist(),
-            'n_clusters': len(set(labels)) - (1 if -1 in labels else 0)
-        }
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/cluster/update', methods=['POST'])
+def update_clustering():
+    """Update a saved minibatch_kmeans model with new customers (partial_fit)."""
+    try:
+        data = request.json
+        customers_data = data.get('customers', [])
         
-        # Save model
-        model_path = os.path.join(MODELS_DIR, f'{algorithm}_model.pkl')
-        segmentation.save_model(model_path)
+        if not customers_data:
+            return jsonify({'error': 'No customer data provided'}), 400
         
-        preprocessor_path = os.path.join(MODELS_DIR, 'preprocessor.pkl')
-        preprocessor.save_preprocessor(preprocessor_path)
+        df = pd.DataFrame(customers_data)
         
-        return jsonify(response), 200
+        # Load, update and save under one lock so concurrent updates do not
+        # start from the same version and overwrite each other
+        with _model_save_lock:
+            try:
+                _, preprocessor_loaded, version = model_registry.get('minibatch_kmeans')
+            except FileNotFoundError:
+                return jsonify({'error': 'Model not found. Please train first.'}), 404
+            
+            # Update a private copy; the registry reloads it once the new version is saved
+            if version[0] == 'artifact':
+                model_path = artifacts.model_dir(os.path.join(
+                    model_registry.artifact_root('minibatch_kmeans'), version[1]))
+            else:
+                model_path = model_registry.model_path('minibatch_kmeans')
+            segmentation_loaded = CustomerSegmentation.load_model(model_path)
+            
+            X, _, customer_ids = preprocessor_loaded.transform(df)
+            labels = segmentation_loaded.partial_fit(X)
+            
+            if version[0] == 'artifact':
+                model_registry.save('minibatch_kmeans', segmentation_loaded, preprocessor_loaded)
+            else:
+                segmentation_loaded.save_model(model_path)
         
-    except Exception as e:
-        import traceback
         return jsonify({
-            'error': str(e),
-            'traceback': traceback.format_exc()
-        }), 500
+            'algorithm': 'minibatch_kmeans',
+            'n_customers': len(df),
+            'customer_ids': customer_ids.tolist() if customer_ids is not None else None,
+            'cluster_ids': labels.astype(int).tolist()
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
 @app.route('/api/predict', methods=['POST'])
 def predict_cluster():
     """Predict cluster for new customer data."""
     try:
+        start = time.perf_counter()
         data = request.json
         customer_data = data.get('customer', {})
         algorithm = data.get('algorithm', 'kmeans')
@@ -167,23 +686,21 @@ def predict_cluster():
         if not customer_data:
             return jsonify({'error': 'No customer data provided'}), 400
         
-        # Load model
-        model_path = os.path.join(MODELS_DIR, f'{algorithm}_model.pkl')
-        if not os.path.exists(model_path):
+        # Load model (cached in memory until the artifacts change on disk)
+        try:
+            segmentation_loaded, preprocessor_loaded, _ = model_registry.get(algorithm)
+        except FileNotFoundError:
             return jsonify({'error': 'Model not found. Please train first.'}), 404
         
-        segmentation_loaded = CustomerSegmentation.load_model(model_path)
-        preprocessor_loaded = DataPreprocessor.load_preprocessor(
-            os.path.join(MODELS_DIR, 'preprocessor.pkl')
-        )
-        
-        # Preprocess new data
+        # Preprocess new data with the fitted statistics (no refitting)
         df = pd.DataFrame([customer_data])
-        X, _, _ = preprocessor_loaded.prepare_for_clustering(df)
+        X, _, _ = preprocessor_loaded.transform(df)
         
         # Predict
         predicted_label = segmentation_loaded.predict_cluster(X)
         
+        model_registry.record_prediction((time.perf_counter() - start) * 1000)
+        
         return jsonify({
             'predicted_cluster': int(predicted_label[0]),
             'customer': customer_data
@@ -192,48 +709,272 @@ def predict_cluster():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/visualizations', methods=['POST'])
-def generate_visualizations():
-    """Generate visualizations for existing cluster results."""
+@app.route('/api/predict/batch', methods=['POST'])
+def predict_cluster_batch():
+    """
+    Predict clusters for many customers in one vectorized pass.
+    Accepts either 'customers' (list of records) or 'columns' (dict of equal-length lists).
+    include_projection adds 2D coordinates on the saved PCA basis.
+    include_confidence adds the distance to the assigned center, the
+    runner-up cluster and a 0-1 confidence margin from the same pass.
+    """
     try:
+        start = time.perf_counter()
         data = request.json
-        customers_data = data.get('customers', [])
+        customers_data = data.get('customers')
+        columns_data = data.get('columns')
+        algorithm = data.get('algorithm', 'kmeans')
         
-        if not customers_data:
+        if not customers_data and not columns_data:
             return jsonify({'error': 'No customer data provided'}), 400
         
-        df = pd.DataFrame(customers_data)
+        try:
+            segmentation_loaded, preprocessor_loaded, _ = model_registry.get(algorithm)
+        except FileNotFoundError:
+            return jsonify({'error': 'Model not found. Please train first.'}), 404
+        
+        # Column-oriented payloads skip the per-record dict handling in pandas
+        df = pd.DataFrame(columns_data) if columns_data else pd.DataFrame(customers_data)
+        X, _, customer_ids = preprocessor_loaded.transform(df)
+        
+        include_confidence = data.get('include_confidence', False)
+        if include_confidence:
+            details = segmentation_loaded.predict_cluster(X, return_details=True)
+            predicted_labels = details['labels']
+        else:
+            predicted_labels = segmentation_loaded.predict_cluster(X)
+        
+        response = {
+            'algorithm': algorithm,
+            'n_customers': len(df),
+            'customer_ids': customer_ids.tolist() if customer_ids is not None else None,
+            'predicted_clusters': predicted_labels.astype(int).tolist()
+        }
+        if data.get('include_projection', False):
+            response['projection'] = preprocessor_loaded.project(X).tolist()
+        if include_confidence:
+            response['distances'] = details['distances'].tolist()
+            response['second_clusters'] = details['second_labels'].astype(int).tolist()
+            response['confidence'] = assignment_confidence(
+                details['distances'], details['second_distances']).tolist()
+        
+        model_registry.record_prediction((time.perf_counter() - start) * 1000, n_rows=len(df))
+        
+        return jsonify(response), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/predict/stats', methods=['GET'])
+def prediction_stats():
+    """Model registry cache and prediction latency statistics."""
+    return jsonify(model_registry.stats()), 200
+
+@app.route('/api/rfm/transactions', methods=['POST'])
+def ingest_transactions():
+    """
+    Fold a batch of new transactions (CustomerID, TransactionDate, Amount)
+    into the RFM store. snapshot=true also persists the store to disk.
+    """
+    try:
+        data, transactions = read_customers_request(table='transactions')
+        
+        if transactions is None or len(transactions) == 0:
+            return jsonify({'error': 'No transactions provided'}), 400
+        missing = [col for col in ['CustomerID', 'TransactionDate', 'Amount']
+                   if col not in transactions.columns]
+        if missing:
+            return jsonify({'error': f'Missing columns: {missing}'}), 400
+        
+        updated = rfm_store.update(transactions)
+        if data.get('snapshot', False):
+            save_rfm_snapshot()
+        
+        return jsonify({
+            'n_transactions': len(transactions),
+            'updated_customers': updated,
+            **rfm_store.stats()
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/rfm', methods=['GET'])
+def get_rfm_features():
+    """
+    Current RFM features, for all customers or a comma-separated
+    customer_ids list. reference_date overrides the Recency reference.
+    """
+    try:
+        customer_ids = request.args.get('customer_ids')
+        if customer_ids:
+            customer_ids = [int(value) for value in customer_ids.split(',')]
+        rfm = rfm_store.features(customer_ids=customer_ids,
+                                 reference_date=request.args.get('reference_date'))
+        
+        return make_payload_response({'n_customers': len(rfm)}, tables={'rfm': rfm})
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/rfm/snapshot', methods=['POST'])
+def snapshot_rfm():
+    """Persist the RFM store to disk."""
+    try:
+        save_rfm_snapshot()
+        return jsonify(rfm_store.stats()), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/visualizations', methods=['POST'])
+def generate_visualizations():
+    """
+    Generate visualizations for existing cluster results.
+    embedding: 'pca' (default) or 'tsne'. t-SNE is fitted on a representative
+    sample sized to time_budget seconds and interpolated to the other points.
+    """
+    try:
+        data, df = read_customers_request()
+        embedding = data.get('embedding', 'pca')
+        time_budget = float(data.get('time_budget', DEFAULT_EMBEDDING_TIME_BUDGET))
+        
+        if df is None or len(df) == 0:
+            return jsonify({'error': 'No customer data provided'}), 400
         
         if 'ClusterID' not in df.columns:
             return jsonify({'error': 'Customers must have ClusterID assigned'}), 400
         
-        # Extract features (exclude ID and cluster columns)
+        if embedding not in ('pca', 'tsne'):
+            return jsonify({'error': f'Unknown embedding: {embedding}'}), 400
+        if time_budget <= 0:
+            return jsonify({'error': 'time_budget must be positive'}), 400
+        
+        # Extract numeric features (exclude ID and cluster columns)
         exclude_cols = ['CustomerID', 'ClusterID', 'ClusterLabel', '_id']
-        feature_cols = [col for col in df.columns if col not in exclude_cols]
+        feature_cols = [col for col in df.columns
+                        if col not in exclude_cols and pd.api.types.is_numeric_dtype(df[col])]
         
         X = df[feature_cols].values
         labels = df['ClusterID'].values
         
-        # Dimensionality reduction
-        prep = DataPreprocessor()
-        X_pca, _ = prep.reduce_dimensions_pca(X, n_components=2)
+        # Features on the trained model's scale when the customers carry them
+        X_model = None
+        preprocessor_loaded = None
+        try:
+            _, preprocessor_loaded, _ = model_registry.get(data.get('algorithm', 'kmeans'))
+        except Exception:
+            # No saved model, or one this environment cannot load: the
+            # projection is fitted on the request's customers instead
+            preprocessor_loaded = None
+        if preprocessor_loaded is not None:
+            numeric_cols = getattr(preprocessor_loaded, 'numeric_cols', None)
+            if numeric_cols and set(numeric_cols) <= set(df.columns):
+                X_model = preprocessor_loaded.transform(df)[0]
+        
+        embedding_info = {'method': 'pca'}
+        if embedding == 'tsne':
+            X_features = (X_model if X_model is not None
+                          else DataPreprocessor().prepare_for_clustering(df, exclude_cols=exclude_cols)[0])
+            X_2d, embedding_info = DataPreprocessor().reduce_dimensions_tsne(
+                X_features, labels=labels, time_budget=time_budget, return_info=True
+            )
+        elif X_model is not None and getattr(preprocessor_loaded, 'projection', None) is not None:
+            # Project with the PCA basis saved alongside the trained model
+            X_2d = preprocessor_loaded.project(X_model)
+        else:
+            prep = DataPreprocessor()
+            X_2d, _ = prep.reduce_dimensions_pca(X.astype(float), n_components=2,
+                                                 method=data.get('projection_method', 'auto'))
+        
+        title = "Customer Segments (t-SNE)" if embedding == 'tsne' else "Customer Segments"
         
         # Generate plots
-        plots = {
-            'clusters_2d': visualizer.plot_clusters_2d(X_pca, labels, "Customer Segments"),
-            'feature_distributions': visualizer.plot_feature_distributions(
-                pd.DataFrame(X, columns=feature_cols), feature_cols, labels
-            ),
-            'correlation_heatmap': visualizer.plot_correlation_heatmap(
-                pd.DataFrame(X, columns=feature_cols), feature_cols
-            )
+        with _pyplot_lock:
+            plots = {
+                'clusters_2d': visualizer.plot_clusters_2d(X_2d, labels, title),
+                'feature_distributions': visualizer.plot_feature_distributions(
+                    pd.DataFrame(X, columns=feature_cols), feature_cols, labels
+                ),
+                'correlation_heatmap': visualizer.plot_correlation_heatmap(
+                    pd.DataFrame(X, columns=feature_cols), feature_cols
+                )
+            }
+        
+        return make_payload_response({'visualizations': plots, 'embedding_info': embedding_info})
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/visualizations/<result_id>/<plot_name>', methods=['GET'])
+def get_result_plot(result_id, plot_name):
+    """
+    Render one plot of a stored clustering result on demand.
+    Rendered plots are cached by data hash, plot name and parameters.
+    Pass ?format=png for raw image bytes instead of base64 JSON.
+    """
+    try:
+        if plot_name not in RESULT_PLOT_NAMES:
+            return jsonify({'error': f'Unknown plot: {plot_name}'}), 404
+        
+        entry = result_store.get(result_id)
+        if entry is None:
+            return jsonify({'error': 'Result not found or expired'}), 404
+        
+        mode = request.args.get('mode', 'auto')
+        if mode not in PLOT_2D_MODES:
+            return jsonify({'error': f'Unknown mode: {mode}. Expected one of {PLOT_2D_MODES}'}), 400
+        try:
+            max_points = int(request.args.get('max_points', 20000))
+        except ValueError:
+            return jsonify({'error': 'max_points must be an integer'}), 400
+        if max_points < 1:
+            return jsonify({'error': 'max_points must be positive'}), 400
+        
+        plot_params = {
+            'title': request.args.get('title'),
+            'mode': mode,
+            'max_points': max_points
         }
+        cache_key = f"{entry['data_hash']}:{plot_name}:{hash_arrays(**plot_params)}"
+        
+        plot = plot_cache.get(cache_key)
+        cached = plot is not None
+        if not cached:
+            with _pyplot_lock:
+                # Another request may have rendered it while this one waited
+                plot = plot_cache.get(cache_key)
+                if plot is None:
+                    image, info = visualizer.render_plot(
+                        plot_name, entry['X'], entry['labels'], entry['feature_names'],
+                        X_reduced=entry['X_reduced'], profiles_df=entry['profiles_df'],
+                        **plot_params
+                    )
+                    plot = {'image': image, 'info': info}
+                    plot_cache.put(cache_key, plot)
+        
+        if request.args.get('format') == 'png':
+            return app.response_class(base64.b64decode(plot['image']), mimetype='image/png')
         
-        return jsonify({'visualizations': plots}), 200
+        return jsonify({
+            'result_id': result_id,
+            'plot_name': plot_name,
+            'image': plot['image'],
+            'render_info': plot['info'],
+            'cached': cached
+        }), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    """Usage and hit/miss counters of the in-memory caches."""
+    return jsonify({
+        'results': result_store.stats(),
+        'plots': plot_cache.stats(),
+        'responses': result_cache.stats()
+    }), 200
+
 @app.route('/api/sample-data', methods=['GET'])
 def get_sample_data():
     """Generate sample Mall Customers dataset."""
@@ -0,0 +1,126 @@
+"""
+Versioned model artifacts: raw .npy arrays next to a small JSON manifest.
+
+Each model version lives in its own directory under the algorithm's artifact
+root and holds a 'model' and a 'preprocessor' part; a CURRENT file names the
+active version. Arrays are loaded with np.load(mmap_mode='r'), so worker
+processes share the pages through the OS page cache instead of each
+unpickling a private copy.
+
+    <root>/CURRENT
+    <root>/<version>/model/manifest.json, cluster_centers.npy, labels.npy, ...
+    <root>/<version>/preprocessor/manifest.json, scaler_mean.npy, ...
+"""
+
+import json
+import os
+import shutil
+import time
+import uuid
+
+import numpy as np
+
+ARTIFACT_FORMAT_VERSION = 1
+MANIFEST_FILE = 'manifest.json'
+CURRENT_FILE = 'CURRENT'
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f'Not JSON serializable: {type(value).__name__}')
+
+def write_part(directory, kind, meta, arrays):
+    """Write a manifest (meta plus array names) and one .npy file per array."""
+    os.makedirs(directory, exist_ok=True)
+    names = []
+    for name, array in arrays.items():
+        if array is None:
+            continue
+        np.save(os.path.join(directory, f'{name}.npy'), np.asarray(array))
+        names.append(name)
+    
+    manifest = {
+        'format_version': ARTIFACT_FORMAT_VERSION,
+        'kind': kind,
+        'arrays': names,
+        'meta': meta
+    }
+    with open(os.path.join(directory, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, default=_json_default)
+
+def read_part(directory, kind, mmap_mode='r'):
+    """Read a part written by write_part. Returns (meta, {name: array})."""
+    with open(os.path.join(directory, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    if manifest.get('kind') != kind:
+        raise ValueError(f"Artifact in {directory} is a {manifest.get('kind')}, not a {kind}")
+    if manifest.get('format_version', 0) > ARTIFACT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported artifact format version {manifest['format_version']}")
+    
+    arrays = {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode)
+              for name in manifest['arrays']}
+    return manifest['meta'], arrays
+
+def is_artifact(path):
+    """Whether path is an artifact part directory."""
+    return os.path.isfile(os.path.join(path, MANIFEST_FILE))
+
+def model_dir(version_dir):
+    return os.path.join(version_dir, 'model')
+
+def preprocessor_dir(version_dir):
+    return os.path.join(version_dir, 'preprocessor')
+
+def current_version(root):
+    """Name of the active version under root, or None if nothing was published."""
+    try:
+        with open(os.path.join(root, CURRENT_FILE)) as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return version if version and os.path.isdir(os.path.join(root, version)) else None
+
+def new_version_name():
+    """
+    Directory name for a new version: a local timestamp with microseconds, so
+    names sort by creation time, plus a random suffix that keeps concurrent
+    writers apart.
+    """
+    # One clock reading for both parts, so the microseconds match the second
+    seconds, nanos = divmod(time.time_ns(), 1_000_000_000)
+    timestamp = time.strftime('%Y%m%d%H%M%S', time.localtime(seconds))
+    return f"{timestamp}{nanos // 1000:06d}-{uuid.uuid4().hex[:8]}"
+
+def publish(root, segmentation, preprocessor, keep_versions=3):
+    """
+    Write segmentation and preprocessor as a new version under root and make
+    it current. The version directory is complete before CURRENT is swapped
+    atomically, so readers never see a partial artifact. Older versions beyond
+    keep_versions are removed (already mapped files stay readable).
+    Returns the version name.
+    """
+    version = new_version_name()
+    version_dir = os.path.join(root, version)
+    tmp_dir = os.path.join(root, f'.{version}.tmp')
+    
+    segmentation.save_artifact(model_dir(tmp_dir))
+    preprocessor.save_artifact(preprocessor_dir(tmp_dir))
+    os.replace(tmp_dir, version_dir)
+    
+    pointer_tmp = os.path.join(root, f'{CURRENT_FILE}.{version}.tmp')
+    with open(pointer_tmp, 'w') as f:
+        f.write(version)
+    os.replace(pointer_tmp, os.path.join(root, CURRENT_FILE))
+    
+    _prune(root, keep_versions)
+    return version
+
+def _prune(root, keep_versions):
+    versions = sorted(name for name in os.listdir(root)
+                      if not name.startswith('.') and os.path.isdir(os.path.join(root, name)))
+    current = current_version(root)
+    for name in versions[:-keep_versions] if keep_versions > 0 else versions:
+        if name != current:
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
@@ -0,0 +1,112 @@
+import numpy as np
+
+# Rows per block; peak scratch memory is about chunk_size x n_centers doubles
+DEFAULT_CHUNK_SIZE = 8192
+
+def assign_nearest(X, centers, cluster_ids=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                   return_details=False):
+    """
+    Assign each row of X to its nearest center.
+    
+    Squared distances use the expanded form ||x||^2 - 2 x.c + ||c||^2,
+    evaluated over fixed-size row blocks (upcast to float64 per block), so
+    memory stays constant in the number of rows and no n x k x d temporary
+    is built. Center positions are mapped to cluster_ids (default 0..k-1).
+    
+    Returns the labels, or with return_details a dict of labels, distances,
+    second_labels and second_distances (Euclidean; -1 / inf when there is
+    only one center) computed in the same pass.
+    """
+    X = np.asarray(X)
+    centers = np.asarray(centers, dtype=np.float64)
+    n_centers = len(centers)
+    if n_centers == 0:
+        raise ValueError("No cluster centers available")
+    
+    cluster_ids = np.arange(n_centers) if cluster_ids is None else np.asarray(cluster_ids)
+    center_sq_norms = (centers ** 2).sum(axis=1)
+    
+    n_samples = len(X)
+    best = np.empty(n_samples, dtype=np.intp)
+    best_sq = np.empty(n_samples)
+    if return_details:
+        second = np.full(n_samples, -1, dtype=np.intp)
+        second_sq = np.full(n_samples, np.inf)
+    
+    rows = np.arange(min(chunk_size, n_samples))
+    for start in range(0, n_samples, chunk_size):
+        block = np.asarray(X[start:start + chunk_size], dtype=np.float64)
+        stop = start + len(block)
+        idx = rows[:len(block)]
+        
+        sq_dist = block @ centers.T
+        sq_dist *= -2
+        sq_dist += (block ** 2).sum(axis=1)[:, np.newaxis]
+        sq_dist += center_sq_norms[np.newaxis, :]
+        np.maximum(sq_dist, 0, out=sq_dist)
+        
+        nearest = sq_dist.argmin(axis=1)
+        best[start:stop] = nearest
+        best_sq[start:stop] = sq_dist[idx, nearest]
+        
+        if return_details and n_centers > 1:
+            sq_dist[idx, nearest] = np.inf
+            runner_up = sq_dist.argmin(axis=1)
+            second[start:stop] = runner_up
+            second_sq[start:stop] = sq_dist[idx, runner_up]
+    
+    labels = cluster_ids[best]
+    if not return_details:
+        return labels
+    
+    return {
+        'labels': labels,
+        'distances': np.sqrt(best_sq),
+        'second_labels': np.where(second >= 0, cluster_ids[np.maximum(second, 0)], -1),
+        'second_distances': np.sqrt(second_sq)
+    }
+
+def assignment_confidence(distances, second_distances):
+    """
+    Relative margin between the nearest and second-nearest center,
+    1 - d1 / d2, in [0, 1]: 0 on the boundary, 1 at the center itself
+    (or when there is no second center).
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        confidence = 1 - distances / second_distances
+    confidence = np.where(np.isfinite(second_distances), confidence, 1.0)
+    return np.clip(np.nan_to_num(confidence, nan=0.0), 0, 1)
+
+def assignment_changes(previous_ids, previous_labels, customer_ids, labels):
+    """
+    Compare cluster assignments of two runs by customer ID (IDs unique per
+    run). Returns (counts, changed) where changed marks the rows of labels
+    whose cluster differs from the previous run or that are new customers.
+    """
+    previous_ids = np.asarray(previous_ids)
+    customer_ids = np.asarray(customer_ids)
+    labels = np.asarray(labels)
+    
+    order = np.argsort(previous_ids, kind='stable')
+    sorted_ids = previous_ids[order]
+    sorted_labels = np.asarray(previous_labels)[order]
+    
+    seen = np.zeros(len(customer_ids), dtype=bool)
+    changed = np.ones(len(customer_ids), dtype=bool)
+    if len(sorted_ids):
+        positions = np.minimum(np.searchsorted(sorted_ids, customer_ids), len(sorted_ids) - 1)
+        seen = sorted_ids[positions] == customer_ids
+        changed[seen] = sorted_labels[positions[seen]] != labels[seen]
+    
+    n_seen = int(seen.sum())
+    n_changed = int((changed & seen).sum())
+    counts = {
+        'customers': len(customer_ids),
+        'compared': n_seen,
+        'unchanged': n_seen - n_changed,
+        'changed': n_changed,
+        'new_customers': len(customer_ids) - n_seen,
+        'removed_customers': len(previous_ids) - n_seen,
+        'changed_fraction': n_changed / n_seen if n_seen else None
+    }
+    return counts, changed
@@ -0,0 +1,79 @@
+"""
+Benchmark JSON record lists against columnar NPZ payloads for the ML service.
+
+Measures the request side (client encode + service decode into a DataFrame)
+and the response side (service encode of the clustered customers + client
+decode) at several row counts.
+
+Usage: python bench_columnar.py [n_rows ...]   (default: 10000 100000 1000000)
+"""
+
+import json
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from columnar import encode_npz, decode_npz
+
+def make_customers(n_rows, seed=42):
+    """Synthetic customers shaped like the Mall Customers dataset."""
+    rng = np.random.RandomState(seed)
+    return pd.DataFrame({
+        'CustomerID': np.arange(1, n_rows + 1),
+        'Gender': rng.choice(['Male', 'Female'], n_rows),
+        'Age': rng.randint(18, 70, n_rows),
+        'AnnualIncome': rng.randint(15, 140, n_rows),
+        'SpendingScore': rng.randint(1, 100, n_rows)
+    })
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+def bench_json(df, result_df):
+    body, encode_req = timed(lambda: json.dumps({'customers': df.to_dict('records')}))
+    _, decode_req = timed(lambda: pd.DataFrame(json.loads(body)['customers']))
+    response, encode_resp = timed(
+        lambda: json.dumps({'customers_with_clusters': result_df.to_dict('records')}))
+    _, decode_resp = timed(lambda: json.loads(response))
+    return {
+        'request_bytes': len(body),
+        'request_s': encode_req + decode_req,
+        'response_bytes': len(response),
+        'response_s': encode_resp + decode_resp
+    }
+
+def bench_npz(df, result_df):
+    body, encode_req = timed(lambda: encode_npz({}, {'customers': df}))
+    _, decode_req = timed(lambda: decode_npz(body)[1]['customers'])
+    response, encode_resp = timed(lambda: encode_npz({}, {'customers_with_clusters': result_df}))
+    _, decode_resp = timed(lambda: decode_npz(response))
+    return {
+        'request_bytes': len(body),
+        'request_s': encode_req + decode_req,
+        'response_bytes': len(response),
+        'response_s': encode_resp + decode_resp
+    }
+
+def main(sizes):
+    header = f"{'rows':>10} {'format':>6} {'req MB':>8} {'req s':>8} {'resp MB':>8} {'resp s':>8}"
+    print(header)
+    print('-' * len(header))
+    
+    for n_rows in sizes:
+        df = make_customers(n_rows)
+        result_df = df.copy()
+        result_df['ClusterID'] = np.arange(n_rows) % 5
+        result_df['ClusterLabel'] = result_df['ClusterID'].map(lambda c: f'Segment {chr(65 + c)}')
+        
+        for name, bench in [('json', bench_json), ('npz', bench_npz)]:
+            r = bench(df, result_df)
+            print(f"{n_rows:>10} {name:>6} {r['request_bytes'] / 1e6:>8.1f} {r['request_s']:>8.3f} "
+                  f"{r['response_bytes'] / 1e6:>8.1f} {r['response_s']:>8.3f}")
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10000, 100000, 1000000]
+    main(sizes)
@@ -0,0 +1,229 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import joblib
+import numpy as np
+
+def hash_arrays(*arrays, **params):
+    """
+    Content hash of numpy arrays plus JSON-serializable parameters.
+    Shape and dtype are part of the hash, so equal bytes with a different
+    layout do not collide.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for array in arrays:
+        if array is None:
+            digest.update(b'none')
+            continue
+        array = np.ascontiguousarray(array)
+        if array.dtype == object:
+            array = array.astype(str)
+        digest.update(f'{array.shape}{array.dtype.str}'.encode())
+        digest.update(array.view(np.uint8).ravel())
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+def hash_dataframe(df, **params):
+    """Content hash of a DataFrame (column names, dtypes and values) plus parameters."""
+    return hash_arrays(*(df[column].to_numpy() for column in df.columns),
+                       columns=[str(column) for column in df.columns], **params)
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache bounded by the total size of its
+    values. sizeof(value) gives the size of an entry (len by default).
+    """
+    
+    def __init__(self, max_bytes, sizeof=len):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key):
+        """Return the cached value or None, marking it as recently used."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+    
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+    
+    def put(self, key, value):
+        """Store a value, evicting least recently used entries to fit max_bytes."""
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            return False
+        
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+        return True
+    
+    def pop(self, key):
+        """Remove an entry, returning its value or None."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return None
+            self.current_bytes -= entry[1]
+            return entry[0]
+    
+    def stats(self):
+        """Return hit/miss/eviction counters and current usage."""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+class ResultCache:
+    """
+    Cache of computed responses keyed by content hash.
+    
+    Entries live in an in-memory LRUCache and, when cache_dir is given, are
+    also written to disk (joblib) so they survive restarts; a memory miss
+    falls back to disk and re-populates memory. validate(value) can reject
+    an entry whose dependencies changed, which counts as a miss (and as stale).
+    """
+    
+    def __init__(self, max_bytes, sizeof=len, cache_dir=None, max_disk_bytes=1024 * 1024 * 1024,
+                 validate=None):
+        self.memory = LRUCache(max_bytes, sizeof=sizeof)
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.validate = validate
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.stale = 0
+        
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+    
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.joblib')
+    
+    def _load_disk(self, key):
+        if self.cache_dir is None:
+            return None
+        try:
+            return joblib.load(self._disk_path(key))
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # Truncated or unreadable entry; drop it
+            self._remove_disk(key)
+            return None
+    
+    def _remove_disk(self, key):
+        if self.cache_dir is not None:
+            try:
+                os.remove(self._disk_path(key))
+            except FileNotFoundError:
+                pass
+    
+    def _count(self, hit, disk=False, stale=False):
+        with self._lock:
+            if hit:
+                self.hits += 1
+                self.disk_hits += int(disk)
+            else:
+                self.misses += 1
+                self.stale += int(stale)
+    
+    def get(self, key):
+        """Return a valid cached value or None."""
+        value = self.memory.get(key)
+        from_disk = False
+        if value is None:
+            value = self._load_disk(key)
+            from_disk = value is not None
+        
+        if value is None:
+            self._count(False)
+            return None
+        
+        if self.validate is not None and not self.validate(value):
+            self.pop(key)
+            self._count(False, stale=True)
+            return None
+        
+        if from_disk:
+            self.memory.put(key, value)
+        self._count(True, disk=from_disk)
+        return value
+    
+    def put(self, key, value):
+        """Store a value in memory and, if enabled, on disk."""
+        self.memory.put(key, value)
+        if self.cache_dir is None:
+            return
+        
+        path = self._disk_path(key)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        joblib.dump(value, tmp_path)
+        os.replace(tmp_path, path)
+        self._prune_disk()
+    
+    def pop(self, key):
+        """Remove an entry from memory and disk."""
+        self.memory.pop(key)
+        self._remove_disk(key)
+    
+    def _prune_disk(self):
+        """Delete the least recently written entries beyond max_disk_bytes."""
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.joblib'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+    
+    def stats(self):
+        """Return hit/miss counters plus in-memory usage."""
+        with self._lock:
+            counters = {
+                'hits': self.hits,
+                'misses': self.misses,
+                'disk_hits': self.disk_hits,
+                'stale': self.stale,
+                'persistent': self.cache_dir is not None
+            }
+        memory = self.memory.stats()
+        counters.update({key: memory[key] for key in ('entries', 'bytes', 'max_bytes', 'evictions')})
+        return counters
@@ -0,0 +1,177 @@
+import numpy as np
+from scipy.stats import norm
+from sklearn.metrics import silhouette_score
+
+SILHOUETTE_MODES = ['auto', 'exact', 'chunked', 'sampled']
+
+# Above this many samples 'auto' switches from exact to sampled silhouette
+AUTO_EXACT_MAX_SAMPLES = 10000
+
+def _chunk_rows(n_samples, memory_budget_mb, itemsize=8):
+    """Number of rows whose distances to all samples fit in the memory budget."""
+    budget = memory_budget_mb * 1024 * 1024
+    return max(1, int(budget // (itemsize * max(n_samples, 1) * 2)))
+
+def silhouette_values(X, labels, rows=None, memory_budget_mb=256, reference=None):
+    """
+    Silhouette values for the given rows (all rows by default), streaming
+    pairwise distances in blocks so memory stays within the budget.
+    Mean distances to each cluster are taken over the reference rows (all
+    rows by default, which is exact); a per-cluster reference sample bounds
+    the cost at len(rows) x len(reference). Every cluster must have a
+    reference row. Labels must not contain noise points.
+    """
+    X = np.asarray(X)
+    unique_labels, codes = np.unique(labels, return_inverse=True)
+    counts = np.bincount(codes)
+    
+    if reference is None:
+        reference = np.arange(len(X))
+    reference = np.asarray(reference)
+    in_reference = np.zeros(len(X), dtype=bool)
+    in_reference[reference] = True
+    
+    # Sort reference rows by cluster so per-cluster distance sums are a single reduceat
+    reference = reference[np.argsort(codes[reference], kind='stable')]
+    reference_counts = np.bincount(codes[reference], minlength=len(counts))
+    if (reference_counts == 0).any():
+        raise ValueError("Every cluster needs at least one reference row")
+    X_sorted = X[reference]
+    sq_norms = (X_sorted ** 2).sum(axis=1)
+    starts = np.concatenate([[0], np.cumsum(reference_counts)[:-1]])
+    
+    if rows is None:
+        rows = np.arange(len(X))
+    rows = np.asarray(rows)
+    
+    values = np.empty(len(rows), dtype=np.float64)
+    chunk_size = _chunk_rows(len(reference), memory_budget_mb, X.dtype.itemsize)
+    
+    for start in range(0, len(rows), chunk_size):
+        block_rows = rows[start:start + chunk_size]
+        X_block = X[block_rows]
+        
+        sq_dist = ((X_block ** 2).sum(axis=1)[:, np.newaxis] - 2 * X_block @ X_sorted.T
+                   + sq_norms[np.newaxis, :])
+        dist = np.sqrt(np.maximum(sq_dist, 0, out=sq_dist), out=sq_dist)
+        # Accumulate in float64 even for float32 features
+        cluster_sums = np.add.reduceat(dist, starts, axis=1, dtype=np.float64)
+        
+        own = codes[block_rows]
+        idx = np.arange(len(block_rows))
+        own_counts = counts[own]
+        
+        # Mean intra-cluster distance (the sample itself contributes zero
+        # when it is one of the reference rows)
+        own_reference = reference_counts[own] - in_reference[block_rows]
+        a = cluster_sums[idx, own] / np.maximum(own_reference, 1)
+        
+        # Mean distance to the nearest other cluster
+        mean_dist = cluster_sums / reference_counts[np.newaxis, :]
+        mean_dist[idx, own] = np.inf
+        b = mean_dist.min(axis=1)
+        
+        denom = np.maximum(a, b)
+        s = np.where(denom > 0, (b - a) / np.where(denom > 0, denom, 1), 0.0)
+        
+        # Silhouette of a sample in a singleton cluster is 0 by convention
+        values[start:start + len(block_rows)] = np.where(own_counts > 1, s, 0.0)
+    
+    return values
+
+def stratified_sample(labels, sample_size, min_per_cluster=20, random_state=42):
+    """
+    Sample row indices proportionally from each cluster, keeping at least
+    min_per_cluster rows (or the whole cluster if smaller) per cluster.
+    Returns (indices, codes, cluster_sizes, sample_sizes).
+    """
+    rng = np.random.RandomState(random_state)
+    _, codes = np.unique(labels, return_inverse=True)
+    cluster_sizes = np.bincount(codes)
+    n_samples = len(labels)
+    
+    sample_sizes = np.round(sample_size * cluster_sizes / n_samples).astype(int)
+    sample_sizes = np.minimum(np.maximum(sample_sizes, min_per_cluster), cluster_sizes)
+    
+    indices = [rng.choice(np.flatnonzero(codes == c), size=sample_sizes[c], replace=False)
+               for c in range(len(cluster_sizes))]
+    
+    return np.concatenate(indices), codes, cluster_sizes, sample_sizes
+
+def sampled_silhouette(X, labels, sample_size=10000, confidence=0.95,
+                       memory_budget_mb=256, random_state=42, reference_size=None):
+    """
+    Estimate the silhouette score from a stratified per-cluster sample.
+    Each sampled row's mean distances to the clusters are estimated from an
+    independent stratified reference sample of reference_size rows (default
+    sample_size), so the cost is O(sample_size x reference_size) rather than
+    O(sample_size x n). The confidence interval uses the stratified variance
+    with finite population correction; it does not include the (smaller)
+    reference sampling error.
+    Returns (score, (ci_low, ci_high), n_sampled).
+    """
+    indices, codes, cluster_sizes, sample_sizes = stratified_sample(
+        labels, sample_size, random_state=random_state)
+    reference = None
+    if reference_size is None:
+        reference_size = sample_size
+    if reference_size < len(labels):
+        reference = stratified_sample(labels, reference_size, random_state=random_state + 1)[0]
+    values = silhouette_values(X, labels, rows=indices, memory_budget_mb=memory_budget_mb,
+                               reference=reference)
+    sample_codes = codes[indices]
+    
+    weights = cluster_sizes / cluster_sizes.sum()
+    means = np.bincount(sample_codes, weights=values) / sample_sizes
+    sq_dev = (values - means[sample_codes]) ** 2
+    variances = np.bincount(sample_codes, weights=sq_dev) / np.maximum(sample_sizes - 1, 1)
+    
+    fpc = 1 - sample_sizes / cluster_sizes
+    score = float((weights * means).sum())
+    std_err = float(np.sqrt((weights ** 2 * variances / sample_sizes * fpc).sum()))
+    z = norm.ppf(0.5 + confidence / 2)
+    
+    return score, (score - z * std_err, score + z * std_err), int(len(indices))
+
+def compute_silhouette(X, labels, mode='auto', sample_size=10000,
+                       memory_budget_mb=256, random_state=42):
+    """
+    Silhouette score computed with the requested mode:
+    'exact' (sklearn), 'chunked' (exact, bounded memory), 'sampled'
+    (stratified estimate with confidence interval) or 'auto' (exact for
+    small data, sampled above AUTO_EXACT_MAX_SAMPLES).
+    Returns a dict with the score and the mode that produced it.
+    """
+    if mode not in SILHOUETTE_MODES:
+        raise ValueError(f"Unknown silhouette mode: {mode}")
+    
+    if mode == 'auto':
+        mode = 'exact' if len(X) <= AUTO_EXACT_MAX_SAMPLES else 'sampled'
+    
+    if mode == 'sampled' and len(X) <= sample_size:
+        # Sample would cover everything; compute exactly with bounded memory
+        mode = 'chunked'
+    
+    if mode == 'exact':
+        return {
+            'silhouette_score': float(silhouette_score(X, labels)),
+            'silhouette_mode': 'exact'
+        }
+    
+    if mode == 'chunked':
+        values = silhouette_values(X, labels, memory_budget_mb=memory_budget_mb)
+        return {
+            'silhouette_score': float(values.mean()),
+            'silhouette_mode': 'chunked'
+        }
+    
+    score, ci, n_sampled = sampled_silhouette(
+        X, labels, sample_size=sample_size,
+        memory_budget_mb=memory_budget_mb, random_state=random_state
+    )
+    return {
+        'silhouette_score': score,
+        'silhouette_mode': 'sampled',
+        'silhouette_ci': [float(ci[0]), float(ci[1])],
+        'silhouette_sample_size': n_sampled
+    }
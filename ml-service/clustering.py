@@ -1,43 +1,281 @@
 import numpy as np
 import pandas as pd
-from sklearn.cluster import KMeans, AgglomerativeClustering, DBSCAN
-from sklearn.metrics import silhouette_score, davies_bouldin_score, calinski_harabasz_score
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components, minimum_spanning_tree
+from scipy.optimize import linear_sum_assignment
+from scipy.spatial.distance import cdist
+from sklearn.cluster import KMeans, MiniBatchKMeans, AgglomerativeClustering, DBSCAN, Birch
+from sklearn.metrics import davies_bouldin_score, calinski_harabasz_score
+from sklearn.neighbors import kneighbors_graph
 import joblib
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
 import warnings
 warnings.filterwarnings('ignore')
 
+from artifacts import is_artifact, read_part, write_part
+from assignment import assign_nearest
+from cluster_metrics import compute_silhouette
+from neighbors import check_dbscan_params, dbscan_from_graph, optics_eps_sweep
+
+# Feature matrix and silhouette options shared by the K sweep worker processes
+_sweep_X = None
+_sweep_silhouette_options = {}
+
+def _init_sweep_worker(X, silhouette_options):
+    global _sweep_X, _sweep_silhouette_options
+    _sweep_X = X
+    _sweep_silhouette_options = silhouette_options
+
+def _fit_k(k, X=None, init='k-means++', n_init=10, random_state=42, silhouette_options=None):
+    """Fit K-Means for one K. Returns (inertia, silhouette result, centers)."""
+    if X is None:
+        X = _sweep_X
+        silhouette_options = _sweep_silhouette_options
+    kmeans = KMeans(n_clusters=k, init=init, random_state=random_state, n_init=n_init)
+    kmeans.fit(X)
+    silhouette = compute_silhouette(X, kmeans.labels_, **(silhouette_options or {}))
+    return float(kmeans.inertia_), silhouette, kmeans.cluster_centers_
+
+def _grow_centers(X, centers, random_state=42):
+    """
+    Seed K+1 centers from a K-center solution by adding one point chosen
+    with k-means++ style D^2 sampling.
+    """
+    rng = np.random.RandomState(random_state + len(centers))
+    sq_dist = ((X ** 2).sum(axis=1)[:, np.newaxis] - 2 * X @ centers.T
+               + (centers ** 2).sum(axis=1)[np.newaxis, :]).min(axis=1)
+    sq_dist = np.maximum(sq_dist, 0)
+    total = sq_dist.sum()
+    if total > 0:
+        new_idx = rng.choice(len(X), p=sq_dist / total)
+    else:
+        new_idx = rng.randint(len(X))
+    return np.vstack([centers, X[new_idx]])
+
+def _match_centers(reference, centers):
+    """
+    Relabeling that maps each of centers to the reference center it is
+    matched with (minimum total distance, one-to-one).
+    """
+    cost = np.linalg.norm(reference[:, np.newaxis] - centers[np.newaxis, :], axis=2)
+    reference_idx, center_idx = linear_sum_assignment(cost)
+    mapping = np.empty(len(centers), dtype=np.intp)
+    mapping[center_idx] = reference_idx
+    return mapping
+
+# Rows per block when accumulating float32 cluster sums in float64
+_MEANS_BLOCK_ROWS = 65536
+
+def _cluster_means(X, labels, cluster_ids):
+    """
+    Mean of X per cluster in a single pass, as a sparse indicator matrix
+    product. Rows are ordered like cluster_ids; other labels are ignored.
+    """
+    cluster_ids = np.asarray(cluster_ids)
+    positions = np.searchsorted(cluster_ids, labels)
+    positions = np.minimum(positions, len(cluster_ids) - 1)
+    member = cluster_ids[positions] == labels
+    
+    counts = np.bincount(positions[member], minlength=len(cluster_ids))
+    
+    # Sums accumulate in float64; float32 input is upcast one block at a
+    # time rather than as a full-size copy
+    block_rows = len(X) if X.dtype == np.float64 else _MEANS_BLOCK_ROWS
+    sums = np.zeros((len(cluster_ids), X.shape[1]))
+    for start in range(0, len(X), block_rows):
+        block_member = member[start:start + block_rows]
+        indicator = sparse.csr_matrix(
+            (np.ones(block_member.sum()),
+             (positions[start:start + block_rows][block_member], np.flatnonzero(block_member))),
+            shape=(len(cluster_ids), len(block_member))
+        )
+        sums += indicator @ np.asarray(X[start:start + block_rows], dtype=np.float64)
+    return sums / np.maximum(counts, 1)[:, np.newaxis]
+
+def _mappable_ids(customer_ids):
+    """Customer IDs as a numeric array for an artifact, or None (object arrays cannot be mapped)."""
+    if customer_ids is None:
+        return None
+    customer_ids = np.asarray(customer_ids)
+    return customer_ids if customer_ids.dtype.kind in 'iuf' else None
+
+def _segment_quantile(sorted_values, starts, sizes, q):
+    """
+    Linearly interpolated quantile q of each contiguous sorted segment
+    (same interpolation as pandas/numpy defaults).
+    """
+    position = q * (sizes - 1)
+    lower = np.floor(position).astype(int)
+    upper = np.ceil(position).astype(int)
+    low_values = sorted_values[starts + lower]
+    high_values = sorted_values[starts + upper]
+    return low_values + (high_values - low_values) * (position - lower)
+
+def _connect_components(X, connectivity, components, n_components):
+    """
+    Join the connected components of a kNN connectivity graph with the
+    edges of a minimum spanning tree over one representative point per
+    component (the member closest to the component centroid). This avoids
+    sklearn's dense component-to-component distance blocks; memory is
+    O(n_components^2).
+    """
+    centroids = _cluster_means(X, components, np.arange(n_components))
+    sq_dist = ((np.asarray(X, dtype=np.float64) - centroids[components]) ** 2).sum(axis=1)
+    order = np.lexsort((sq_dist, components))
+    representatives = order[np.searchsorted(components[order], np.arange(n_components))]
+    
+    points = np.asarray(X[representatives], dtype=np.float64)
+    distances = cdist(points, points)
+    tree = minimum_spanning_tree(np.maximum(distances, 1e-12)).tocoo()
+    
+    rows = representatives[tree.row]
+    cols = representatives[tree.col]
+    bridges = sparse.csr_matrix(
+        (np.ones(2 * len(rows)), (np.concatenate([rows, cols]), np.concatenate([cols, rows]))),
+        shape=connectivity.shape
+    )
+    return (connectivity + bridges).tocsr()
+
+def profile_quantiles(extra_stats):
+    """
+    Validate profile_clusters extra_stats and return the quantiles to compute
+    as {column name: fraction}, always including the median.
+    """
+    if not isinstance(extra_stats, (list, tuple)):
+        raise ValueError("profile_stats must be a list")
+    
+    quantiles = {'median': 0.5}
+    for stat in extra_stats:
+        if not isinstance(stat, str):
+            raise ValueError(f"Unknown profile statistic: {stat}")
+        if stat.startswith('q'):
+            try:
+                percent = float(stat[1:])
+            except ValueError:
+                percent = np.nan
+            if not 0 <= percent <= 100:
+                raise ValueError(f"Quantile statistic must be q0 to q100: {stat}")
+            quantiles[stat] = percent / 100
+        elif stat in ('min', 'max'):
+            quantiles[stat] = 0.0 if stat == 'min' else 1.0
+        elif stat != 'std':
+            raise ValueError(f"Unknown profile statistic: {stat}")
+    return quantiles
+
+def _condensed_distance_mb(n_samples):
+    """Memory (MB) of the condensed distance matrix used by exact agglomeration."""
+    return n_samples * (n_samples - 1) / 2 * 8 / (1024 * 1024)
+
+def _inertia_flattened(inertias, tol):
+    """True when the last K step improved inertia by less than tol (relative)."""
+    if tol is None or len(inertias) < 2 or inertias[-2] <= 0:
+        return False
+    return (inertias[-2] - inertias[-1]) / inertias[-2] < tol
+
 class CustomerSegmentation:
     """Clustering algorithms for customer segmentation."""
     
-    def __init__(self):
+    def __init__(self, metrics_mode='auto', metrics_sample_size=10000, memory_budget_mb=256,
+                 neighbor_cache=None, on_stage=None):
         self.model = None
         self.labels = None
         self.cluster_centers = None
+        # Cluster ID of each row of cluster_centers (None means 0..k-1)
+        self.cluster_ids = None
+        # CustomerID of each row of labels, when known
+        self.customer_ids = None
+        # Outcome of the last fit_kmeans_warm_start
+        self.warm_start_info = None
         self.metrics = {}
         self.algorithm = None
         
-    def elbow_method(self, X, k_range=range(2, 11)):
+        # Silhouette mode: 'auto', 'exact', 'chunked' or 'sampled'
+        self.metrics_mode = metrics_mode
+        self.metrics_sample_size = metrics_sample_size
+        self.memory_budget_mb = memory_budget_mb
+        
+        # Optional NeighborGraphCache shared across DBSCAN runs
+        self.neighbor_cache = neighbor_cache
+        
+        # Optional callback notified when a fit moves on to computing metrics
+        self.on_stage = on_stage
+        
+    def elbow_method(self, X, k_range=range(2, 11), n_jobs=1, warm_start=False,
+                     early_stop_tol=None):
         """
         Compute inertia for different K values to find optimal K using elbow method.
         Returns dict with K values and corresponding inertia.
+        
+        n_jobs: number of worker processes used to fit K values concurrently
+            (-1 for all cores). Ignored when warm_start is set.
+        warm_start: seed each K from the previous K's centers plus one new
+            center, with a single init instead of 10. Runs sequentially.
+        early_stop_tol: stop once a K step improves inertia by less than this
+            fraction. With n_jobs > 1 the check runs after each batch of K values.
         """
+        k_values = list(k_range)
+        silhouette_options = self._silhouette_options()
+        if n_jobs is None or n_jobs < 1:
+            n_jobs = os.cpu_count() or 1
+        
         inertias = []
         silhouette_scores = []
+        silhouette_modes = []
+        evaluated = []
         
-        for k in k_range:
-            kmeans = KMeans(n_clusters=k, random_state=42, n_init=10)
-            kmeans.fit(X)
-            inertias.append(kmeans.inertia_)
-            
-            # Compute silhouette score
-            labels = kmeans.labels_
-            sil_score = silhouette_score(X, labels)
-            silhouette_scores.append(sil_score)
+        if warm_start or n_jobs == 1:
+            centers = None
+            for k in k_values:
+                if warm_start and centers is not None and len(centers) == k - 1:
+                    inertia, silhouette, centers = _fit_k(
+                        k, X, init=_grow_centers(X, centers), n_init=1,
+                        silhouette_options=silhouette_options)
+                else:
+                    inertia, silhouette, centers = _fit_k(
+                        k, X, silhouette_options=silhouette_options)
+                
+                evaluated.append(k)
+                inertias.append(inertia)
+                silhouette_scores.append(silhouette['silhouette_score'])
+                silhouette_modes.append(silhouette['silhouette_mode'])
+                
+                if _inertia_flattened(inertias, early_stop_tol):
+                    break
+        else:
+            # Spawned workers: forking a threaded server process can copy held locks
+            with ProcessPoolExecutor(max_workers=n_jobs, mp_context=multiprocessing.get_context('spawn'),
+                                     initializer=_init_sweep_worker,
+                                     initargs=(X, silhouette_options)) as executor:
+                # Submit K values in batches so early stopping can skip the rest
+                batch_size = n_jobs if early_stop_tol is not None else len(k_values)
+                for start in range(0, len(k_values), batch_size):
+                    batch = k_values[start:start + batch_size]
+                    stopped = False
+                    for k, (inertia, silhouette, _) in zip(batch, executor.map(_fit_k, batch)):
+                        evaluated.append(k)
+                        inertias.append(inertia)
+                        silhouette_scores.append(silhouette['silhouette_score'])
+                        silhouette_modes.append(silhouette['silhouette_mode'])
+                        if _inertia_flattened(inertias, early_stop_tol):
+                            stopped = True
+                            break
+                    if stopped:
+                        break
         
         return {
-            'k_values': list(k_range),
+            'k_values': evaluated,
             'inertias': inertias,
-            'silhouette_scores': silhouette_scores
+            'silhouette_scores': silhouette_scores,
+            'silhouette_modes': silhouette_modes
+        }
+    
+    def _silhouette_options(self):
+        return {
+            'mode': self.metrics_mode,
+            'sample_size': self.metrics_sample_size,
+            'memory_budget_mb': self.memory_budget_mb
         }
     
     def fit_kmeans(self, X, n_clusters=5, random_state=42):
@@ -52,34 +290,192 @@ class CustomerSegmentation:
         
         return self.labels
     
-    def fit_hierarchical(self, X, n_clusters=5, linkage='ward'):
-        """Fit Hierarchical (Agglomerative) clustering."""
-        self.algorithm = 'hierarchical'
-        self.model = AgglomerativeClustering(n_clusters=n_clusters, linkage=linkage)
+    def fit_kmeans_warm_start(self, X, init_centers, max_center_shift=0.5, random_state=42):
+        """
+        Re-fit K-Means seeded from previous centers (in X's feature space)
+        with a single init, so cluster IDs carry over.
+        
+        Drift is measured as the largest center movement relative to the RMS
+        point-to-center distance. Above max_center_shift the old solution is
+        not a trustworthy seed: a full fit (n_init=10) runs instead and its
+        clusters are matched to the previous IDs. self.warm_start_info records
+        which path was taken.
+        """
+        self.algorithm = 'kmeans'
+        init_centers = np.asarray(init_centers, dtype=np.float64)
+        n_clusters = len(init_centers)
+        
+        self.model = KMeans(n_clusters=n_clusters, init=init_centers, n_init=1,
+                            random_state=random_state)
         self.labels = self.model.fit_predict(X)
         
-        # Compute cluster centers manually
-        self.cluster_centers = np.array([X[self.labels == i].mean(axis=0) 
-                                         for i in range(n_clusters)])
+        rms_distance = np.sqrt(self.model.inertia_ / len(X))
+        shift = np.linalg.norm(self.model.cluster_centers_ - init_centers, axis=1).max()
+        center_shift = float(shift / rms_distance) if rms_distance > 0 else 0.0
+        self.warm_start_info = {
+            'used': True,
+            'center_shift': center_shift,
+            'max_center_shift': max_center_shift,
+            'n_iter': int(self.model.n_iter_)
+        }
+        
+        if center_shift > max_center_shift:
+            self.model = KMeans(n_clusters=n_clusters, random_state=random_state, n_init=10)
+            labels = self.model.fit_predict(X)
+            
+            # Keep cluster IDs stable across the refit
+            mapping = _match_centers(init_centers, self.model.cluster_centers_)
+            order = np.argsort(mapping)
+            self.model.cluster_centers_ = self.model.cluster_centers_[order]
+            self.model.labels_ = mapping[labels]
+            self.labels = self.model.labels_
+            self.warm_start_info.update(used=False, refit_reason='drift')
+        
+        self.cluster_centers = self.model.cluster_centers_
+        
+        # Compute metrics
+        self._compute_metrics(X)
+        
+        return self.labels
+    
+    def fit_minibatch_kmeans(self, X, n_clusters=5, batch_size=1024, n_passes=10,
+                             random_state=42):
+        """
+        Fit Mini-Batch K-Means on batches of batch_size rows for at most
+        n_passes passes over the data (stopping early once the centers
+        settle). The fitted model can be updated later with partial_fit as
+        new customers arrive.
+        """
+        self.algorithm = 'minibatch_kmeans'
+        self.model = MiniBatchKMeans(n_clusters=n_clusters, batch_size=batch_size,
+                                     max_iter=n_passes, random_state=random_state, n_init=3)
+        self.labels = self.model.fit_predict(X)
+        self.cluster_centers = self.model.cluster_centers_
+        
+        # Compute metrics
+        self._compute_metrics(X)
+        
+        return self.labels
+    
+    def partial_fit(self, X_new):
+        """
+        Update a fitted Mini-Batch K-Means model with new customers.
+        Returns the cluster assignments of the new rows.
+        """
+        if self.algorithm != 'minibatch_kmeans' or self.model is None:
+            raise ValueError("partial_fit requires a fitted minibatch_kmeans model")
+        
+        self.model.partial_fit(X_new)
+        self.cluster_centers = self.model.cluster_centers_
+        
+        return self.model.predict(X_new)
+    
+    def fit_hierarchical(self, X, n_clusters=5, linkage='ward', method='auto',
+                         memory_budget_mb=None, n_neighbors=15, birch_threshold=0.5):
+        """
+        Fit Hierarchical (Agglomerative) clustering.
+        
+        method:
+            'exact' - agglomeration on the full data (quadratic memory).
+            'birch' - BIRCH CF-tree summarizes the data into subclusters, then
+                the subcluster centers are agglomerated. The threshold grows
+                until the subclusters fit the memory budget.
+            'knn' - agglomeration constrained by a sparse kNN connectivity graph.
+                Disconnected graph components are joined through one
+                representative point each; when even that does not fit
+                memory_budget_mb, 'birch' is used instead.
+            'auto' - 'exact' when the distance matrix fits memory_budget_mb,
+                otherwise 'birch'.
+        """
+        self.algorithm = 'hierarchical'
+        if memory_budget_mb is None:
+            memory_budget_mb = self.memory_budget_mb
+        
+        if method == 'auto':
+            method = 'exact' if _condensed_distance_mb(len(X)) <= memory_budget_mb else 'birch'
+        
+        if method == 'knn':
+            connectivity = kneighbors_graph(X, n_neighbors=min(n_neighbors, len(X) - 1),
+                                            include_self=False)
+            # sklearn would join components with dense pairwise distance blocks
+            n_components, components = connected_components(connectivity, directed=False)
+            if n_components > 1:
+                if n_components ** 2 * 8 / (1024 * 1024) > memory_budget_mb:
+                    method = 'birch'
+                else:
+                    connectivity = _connect_components(X, connectivity, components, n_components)
+        
+        if method == 'exact':
+            self.model = AgglomerativeClustering(n_clusters=n_clusters, linkage=linkage)
+            self.labels = self.model.fit_predict(X)
+        elif method == 'knn':
+            self.model = AgglomerativeClustering(n_clusters=n_clusters, linkage=linkage,
+                                                 connectivity=connectivity)
+            self.labels = self.model.fit_predict(X)
+        elif method == 'birch':
+            # Largest number of subclusters whose distance matrix fits the budget
+            max_subclusters = int(np.sqrt(2 * memory_budget_mb * 1024 * 1024 / 8))
+            threshold = birch_threshold
+            # Only the CF tree is built here; agglomerating inside Birch would
+            # run on every oversized subcluster set before it could be rejected
+            while True:
+                self.model = Birch(threshold=threshold, n_clusters=None)
+                self.model.fit(X)
+                if len(self.model.subcluster_centers_) <= max_subclusters:
+                    break
+                threshold *= 1.5
+            
+            # Agglomerate the subcluster centers once, then map points through
+            # their subcluster (Birch.predict uses subcluster_labels_ too)
+            subclusters = self.model.labels_
+            global_model = AgglomerativeClustering(
+                n_clusters=min(n_clusters, len(self.model.subcluster_centers_)), linkage=linkage
+            )
+            self.model.subcluster_labels_ = global_model.fit_predict(self.model.subcluster_centers_)
+            self.labels = self.model.subcluster_labels_[subclusters]
+            self.model.labels_ = self.labels
+        else:
+            raise ValueError(f"Unknown hierarchical method: {method}")
+        
+        # Compute cluster centers in one pass; BIRCH can yield fewer than
+        # n_clusters clusters when there are fewer subclusters
+        self.cluster_ids = np.unique(self.labels)
+        self.cluster_centers = _cluster_means(X, self.labels, self.cluster_ids)
         
         # Compute metrics
         self._compute_metrics(X)
+        self.metrics['hierarchical_method'] = method
         
         return self.labels
     
     def fit_dbscan(self, X, eps=0.5, min_samples=5):
-        """Fit DBSCAN clustering."""
+        """
+        Fit DBSCAN clustering.
+        With a neighbor_cache, labels are extracted from a cached sparse
+        radius-neighbors graph that is reused for any later eps <= the cached
+        radius, so only the first call pays for the radius queries.
+        """
         self.algorithm = 'dbscan'
-        self.model = DBSCAN(eps=eps, min_samples=min_samples)
-        self.labels = self.model.fit_predict(X)
+        if self.neighbor_cache is not None:
+            check_dbscan_params(eps, min_samples)
+            graph = self.neighbor_cache.radius_graph(X, eps)
+            self.labels, core_indices = dbscan_from_graph(graph, min_samples=min_samples)
+            
+            # Keep a DBSCAN estimator with the fitted attributes for persistence
+            self.model = DBSCAN(eps=eps, min_samples=min_samples)
+            self.model.labels_ = self.labels
+            self.model.core_sample_indices_ = core_indices
+        else:
+            self.model = DBSCAN(eps=eps, min_samples=min_samples)
+            self.labels = self.model.fit_predict(X)
         
         # DBSCAN can have noise points (label=-1)
         n_clusters = len(set(self.labels)) - (1 if -1 in self.labels else 0)
         
         if n_clusters > 0:
             # Compute cluster centers for non-noise points
-            self.cluster_centers = np.array([X[self.labels == i].mean(axis=0) 
-                                            for i in set(self.labels) if i != -1])
+            self.cluster_ids = np.unique(self.labels[self.labels != -1])
+            self.cluster_centers = _cluster_means(X, self.labels, self.cluster_ids)
             
             # Compute metrics
             if n_clusters > 1:
@@ -89,11 +485,29 @@ class CustomerSegmentation:
         else:
             self.metrics = {'error': 'No clusters found, all points are noise'}
             self.cluster_centers = None
+            self.cluster_ids = None
         
         return self.labels
     
+    def dbscan_eps_sweep(self, X, eps_values, min_samples=5):
+        """
+        Extract DBSCAN-style clusterings for several eps values from a single
+        OPTICS pass. Returns a list of per-eps cluster and noise counts.
+        """
+        results = []
+        for eps, labels in optics_eps_sweep(X, eps_values, min_samples=min_samples).items():
+            results.append({
+                'eps': float(eps),
+                'n_clusters': int(len(set(labels)) - (1 if -1 in labels else 0)),
+                'n_noise_points': int((labels == -1).sum())
+            })
+        return results
+    
     def _compute_metrics(self, X):
         """Compute clustering quality metrics."""
+        if self.on_stage is not None:
+            self.on_stage('metrics')
+        
         # Only compute if we have at least 2 clusters
         n_clusters = len(set(self.labels)) - (1 if -1 in self.labels else 0)
         
@@ -104,55 +518,91 @@ class CustomerSegmentation:
             }
             return
         
-        # Filter out noise points for DBSCAN
+        # Filter out noise points for DBSCAN (no copy when there is no noise)
         mask = self.labels != -1
-        X_filtered = X[mask]
-        labels_filtered = self.labels[mask]
+        if mask.all():
+            X_filtered, labels_filtered = X, self.labels
+        else:
+            X_filtered = X[mask]
+            labels_filtered = self.labels[mask]
         
         try:
+            silhouette = compute_silhouette(X_filtered, labels_filtered, **self._silhouette_options())
             self.metrics = {
                 'n_clusters': n_clusters,
-                'silhouette_score': float(silhouette_score(X_filtered, labels_filtered)),
+                'silhouette_score': silhouette['silhouette_score'],
                 'davies_bouldin_score': float(davies_bouldin_score(X_filtered, labels_filtered)),
                 'calinski_harabasz_score': float(calinski_harabasz_score(X_filtered, labels_filtered)),
                 'n_samples': len(X),
-                'n_noise_points': int((self.labels == -1).sum()) if self.algorithm == 'dbscan' else 0
+                'n_noise_points': int((self.labels == -1).sum()) if self.algorithm == 'dbscan' else 0,
+                'metric_modes': {
+                    'silhouette_score': silhouette['silhouette_mode'],
+                    'davies_bouldin_score': 'exact',
+                    'calinski_harabasz_score': 'exact'
+                }
             }
+            if 'silhouette_ci' in silhouette:
+                self.metrics['silhouette_ci'] = silhouette['silhouette_ci']
+                self.metrics['silhouette_sample_size'] = silhouette['silhouette_sample_size']
         except Exception as e:
             self.metrics = {'error': str(e)}
     
-    def profile_clusters(self, X, feature_names, original_df=None):
+    def profile_clusters(self, X, feature_names, original_df=None, extra_stats=None):
         """
         Create profile for each cluster with mean/median values.
         Returns DataFrame with cluster statistics.
+        
+        All statistics come from one grouped pass: means and standard
+        deviations from a sparse indicator product, medians and quantiles from
+        a per-feature sort segmented by cluster.
+        extra_stats: optional list of 'std', 'min', 'max' and quantiles written
+            as 'q<percent>' with percent in 0-100 (e.g. 'q25', 'q75').
         """
-        # Create DataFrame with features and labels
-        df = pd.DataFrame(X, columns=feature_names)
-        df['Cluster'] = self.labels
+        extra_stats = list(extra_stats or [])
+        X = np.asarray(X)
         
         # Exclude noise points for DBSCAN
-        df_clean = df[df['Cluster'] != -1]
+        mask = self.labels != -1
+        if mask.all():
+            X_clean, labels_clean = X, self.labels
+        else:
+            X_clean = X[mask]
+            labels_clean = self.labels[mask]
         
-        # Compute statistics per cluster
-        profiles = []
+        cluster_ids, codes, sizes = np.unique(labels_clean, return_inverse=True,
+                                              return_counts=True)
+        starts = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(int)
         
-        for cluster_id in sorted(df_clean['Cluster'].unique()):
-            cluster_data = df_clean[df_clean['Cluster'] == cluster_id]
-            
-            profile = {
-                'ClusterID': int(cluster_id),
-                'Size': len(cluster_data),
-                'Percentage': round(len(cluster_data) / len(df_clean) * 100, 2)
-            }
+        means = _cluster_means(X_clean, labels_clean, cluster_ids)
+        if 'std' in extra_stats:
+            sq_dev = (X_clean - means[codes]) ** 2
+            sq_sums = _cluster_means(sq_dev, labels_clean, cluster_ids) * sizes[:, np.newaxis]
+            # Sample std; single-member clusters get 0 (NaN is not valid JSON)
+            stds = np.sqrt(sq_sums / np.maximum(sizes - 1, 1)[:, np.newaxis])
+        
+        quantiles = profile_quantiles(extra_stats)
+        
+        profile = {
+            'ClusterID': cluster_ids.astype(int),
+            'Size': sizes,
+            'Percentage': np.round(sizes / max(len(labels_clean), 1) * 100, 2)
+        }
+        
+        for j, feature in enumerate(feature_names):
+            # Sort values within each cluster segment once per feature
+            order = np.lexsort((X_clean[:, j], codes))
+            sorted_values = X_clean[order, j]
             
-            # Add mean values for each feature
-            for feature in feature_names:
-                profile[f'{feature}_mean'] = round(cluster_data[feature].mean(), 2)
-                profile[f'{feature}_median'] = round(cluster_data[feature].median(), 2)
+            segment_stats = {name: _segment_quantile(sorted_values, starts, sizes, q)
+                             for name, q in quantiles.items()}
             
-            profiles.append(profile)
+            profile[f'{feature}_mean'] = np.round(means[:, j], 2)
+            profile[f'{feature}_median'] = np.round(segment_stats['median'], 2)
+            for stat in extra_stats:
+                values = stds[:, j] if stat == 'std' else segment_stats[stat]
+                profile[f'{feature}_{stat}'] = np.round(values, 2)
         
-        profiles_df = pd.DataFrame(profiles)
+        profiles_df = pd.DataFrame(profile)
         
         # Auto-label clusters based on characteristics
         profiles_df['Label'] = self._auto_label_clusters(profiles_df, feature_names)
@@ -161,68 +611,72 @@ class CustomerSegmentation:
     
     def _auto_label_clusters(self, profiles_df, feature_names):
         """Automatically generate meaningful labels for clusters."""
-        labels = []
+        if len(profiles_df) == 0:
+            return []
         
         # Check if we have income and spending features
         has_income = any('income' in f.lower() for f in feature_names)
         has_spending = any('spending' in f.lower() or 'monetary' in f.lower() for f in feature_names)
         
-        for _, row in profiles_df.iterrows():
-            if has_income and has_spending:
-                # Find income and spending columns
-                income_col = [f for f in profiles_df.columns if 'income' in f.lower() and 'mean' in f.lower()][0]
-                spending_col = [f for f in profiles_df.columns if ('spending' in f.lower() or 'monetary' in f.lower()) and 'mean' in f.lower()][0]
-                
-                income_val = row[income_col]
-                spending_val = row[spending_col]
-                
-                # Determine relative position
-                all_income = profiles_df[income_col]
-                all_spending = profiles_df[spending_col]
-                
-                income_percentile = (income_val > all_income).sum() / len(all_income)
-                spending_percentile = (spending_val > all_spending).sum() / len(all_spending)
-                
-                # Create labels
-                if income_percentile > 0.66 and spending_percentile > 0.66:
-                    label = "Premium High Spenders"
-                elif income_percentile > 0.66 and spending_percentile < 0.33:
-                    label = "Affluent Savers"
-                elif income_percentile < 0.33 and spending_percentile > 0.66:
-                    label = "Budget Splurgers"
-                elif income_percentile < 0.33 and spending_percentile < 0.33:
-                    label = "Careful Shoppers"
-                elif spending_percentile > 0.66:
-                    label = "Active Shoppers"
-                else:
-                    label = "Average Customers"
-            else:
-                # Generic labeling based on cluster size
-                if row['Percentage'] > 30:
-                    label = "Mainstream Segment"
-                elif row['Percentage'] < 10:
-                    label = "Niche Segment"
-                else:
-                    label = f"Segment {chr(65 + int(row['ClusterID']))}"  # A, B, C, etc.
+        if has_income and has_spending:
+            # Find income and spending columns
+            income_col = [f for f in profiles_df.columns if 'income' in f.lower() and 'mean' in f.lower()][0]
+            spending_col = [f for f in profiles_df.columns if ('spending' in f.lower() or 'monetary' in f.lower()) and 'mean' in f.lower()][0]
+            
+            income = profiles_df[income_col].to_numpy()
+            spending = profiles_df[spending_col].to_numpy()
+            
+            # Determine relative position: share of clusters each value exceeds
+            income_percentile = (income[:, np.newaxis] > income[np.newaxis, :]).mean(axis=1)
+            spending_percentile = (spending[:, np.newaxis] > spending[np.newaxis, :]).mean(axis=1)
             
-            labels.append(label)
+            # Create labels
+            conditions = [
+                (income_percentile > 0.66) & (spending_percentile > 0.66),
+                (income_percentile > 0.66) & (spending_percentile < 0.33),
+                (income_percentile < 0.33) & (spending_percentile > 0.66),
+                (income_percentile < 0.33) & (spending_percentile < 0.33),
+                spending_percentile > 0.66
+            ]
+            choices = [
+                "Premium High Spenders",
+                "Affluent Savers",
+                "Budget Splurgers",
+                "Careful Shoppers",
+                "Active Shoppers"
+            ]
+            return np.select(conditions, choices, default="Average Customers").tolist()
         
-        return labels
+        # Generic labeling based on cluster size
+        percentage = profiles_df['Percentage'].to_numpy()
+        segment_names = np.array([f"Segment {chr(65 + int(cluster_id))}"  # A, B, C, etc.
+                                  for cluster_id in profiles_df['ClusterID']])
+        labels = np.where(percentage > 30, "Mainstream Segment",
+                          np.where(percentage < 10, "Niche Segment", segment_names))
+        return labels.tolist()
     
-    def predict_cluster(self, X):
-        """Predict cluster for new data points."""
-        if self.model is None:
+    def predict_cluster(self, X, return_details=False):
+        """
+        Predict cluster for new data points.
+        With return_details, also return the distance to the assigned center
+        and the second-nearest cluster and its distance (see assign_nearest).
+        """
+        # Models loaded from an artifact may have no estimator, only centers
+        if self.algorithm is None:
             raise ValueError("Model not fitted yet")
         
-        if self.algorithm == 'kmeans':
-            return self.model.predict(X)
+        if self.algorithm in ['kmeans', 'minibatch_kmeans']:
+            if self.model is not None and not return_details:
+                return self.model.predict(X)
+            centers = self.model.cluster_centers_ if self.model is not None else self.cluster_centers
+            return assign_nearest(X, centers, return_details=return_details)
         elif self.algorithm in ['hierarchical', 'dbscan']:
             # For algorithms without predict, find nearest cluster center
             if self.cluster_centers is None:
                 raise ValueError("No cluster centers available")
             
-            distances = np.linalg.norm(X[:, np.newaxis] - self.cluster_centers, axis=2)
-            return np.argmin(distances, axis=1)
+            return assign_nearest(X, self.cluster_centers, cluster_ids=self.cluster_ids,
+                                  return_details=return_details)
         else:
             raise ValueError(f"Unknown algorithm: {self.algorithm}")
     
@@ -232,19 +686,65 @@ class CustomerSegmentation:
             'model': self.model,
             'algorithm': self.algorithm,
             'cluster_centers': self.cluster_centers,
+            'cluster_ids': self.cluster_ids,
             'metrics': self.metrics,
-            'labels': self.labels
+            'labels': self.labels,
+            'customer_ids': self.customer_ids
         }
         joblib.dump(model_data, filepath)
     
+    def save_artifact(self, directory):
+        """
+        Save the model as an artifact directory: centers, cluster IDs and
+        labels as .npy arrays plus a JSON manifest. Only Mini-Batch K-Means
+        keeps its (small) estimator, which partial_fit needs; the others
+        predict from the centers alone.
+        """
+        if self.algorithm == 'minibatch_kmeans' and self.model is not None:
+            os.makedirs(directory, exist_ok=True)
+            joblib.dump(self.model, os.path.join(directory, 'estimator.joblib'))
+        
+        write_part(directory, 'model',
+                   meta={'algorithm': self.algorithm, 'metrics': self.metrics},
+                   arrays={'cluster_centers': self.cluster_centers,
+                           'cluster_ids': self.cluster_ids,
+                           'labels': self.labels,
+                           'customer_ids': _mappable_ids(self.customer_ids)})
+    
+    @staticmethod
+    def _load_artifact(directory, mmap_mode='r'):
+        meta, arrays = read_part(directory, 'model', mmap_mode=mmap_mode)
+        seg = CustomerSegmentation()
+        seg.algorithm = meta['algorithm']
+        seg.metrics = meta['metrics']
+        seg.cluster_centers = arrays.get('cluster_centers')
+        seg.cluster_ids = arrays.get('cluster_ids')
+        seg.labels = arrays.get('labels')
+        seg.customer_ids = arrays.get('customer_ids')
+        
+        estimator_path = os.path.join(directory, 'estimator.joblib')
+        if os.path.exists(estimator_path):
+            seg.model = joblib.load(estimator_path)
+        return seg
+    
     @staticmethod
-    def load_model(filepath='clustering_model.pkl'):
-        """Load a saved model."""
+    def load_model(filepath='clustering_model.pkl', mmap_mode='r'):
+        """
+        Load a saved model: a pickle written by save_model, or an artifact
+        directory written by save_artifact (arrays memory-mapped with mmap_mode).
+        """
+        if os.path.isdir(filepath):
+            if not is_artifact(filepath):
+                raise FileNotFoundError(f'No model artifact in {filepath}')
+            return CustomerSegmentation._load_artifact(filepath, mmap_mode=mmap_mode)
+        
         model_data = joblib.load(filepath)
         seg = CustomerSegmentation()
         seg.model = model_data['model']
         seg.algorithm = model_data['algorithm']
         seg.cluster_centers = model_data['cluster_centers']
+        seg.cluster_ids = model_data.get('cluster_ids')
         seg.metrics = model_data['metrics']
         seg.labels = model_data.get('labels')
+        seg.customer_ids = model_data.get('customer_ids')
         return seg
@@ -0,0 +1,73 @@
+"""
+Columnar binary payloads for the ML service.
+
+A payload is an uncompressed NPZ archive of typed arrays:
+    __meta__              JSON-encoded scalars, dicts and small lists (uint8)
+    <table>/<column>      one array per column of a tabular field
+    __null__/<table>/<column>  missing-value mask of a string column (bool),
+                          present only when the column has missing values
+Strings are stored as fixed-width unicode arrays, so archives load with
+allow_pickle=False; the null masks restore missing strings as None.
+"""
+
+import io
+import json
+
+import numpy as np
+import pandas as pd
+
+NPZ_MIMETYPE = 'application/x-npz'
+JSON_MIMETYPE = 'application/json'
+_NULL_PREFIX = '__null__/'
+
+def _column_array(series):
+    """
+    Typed array for a DataFrame column plus its null mask (or None).
+    Object columns become unicode with missing values stored as ''.
+    """
+    if series.dtype == object:
+        missing = series.isna().to_numpy()
+        if missing.any():
+            return series.where(~missing, '').to_numpy(dtype=str), missing
+        return series.to_numpy(dtype=str), None
+    return series.to_numpy(), None
+
+def encode_npz(meta, tables=None):
+    """Encode a metadata dict plus {name: DataFrame} tables as NPZ bytes."""
+    arrays = {'__meta__': np.frombuffer(json.dumps(meta).encode('utf-8'), dtype=np.uint8)}
+    for name, df in (tables or {}).items():
+        for column in df.columns:
+            values, missing = _column_array(df[column])
+            arrays[f'{name}/{column}'] = values
+            if missing is not None:
+                arrays[f'{_NULL_PREFIX}{name}/{column}'] = missing
+    
+    buf = io.BytesIO()
+    np.savez(buf, **arrays)
+    return buf.getvalue()
+
+def decode_npz(data):
+    """Decode NPZ bytes into (meta dict, {name: DataFrame})."""
+    columns = {}
+    null_masks = {}
+    meta = {}
+    with np.load(io.BytesIO(data), allow_pickle=False) as archive:
+        for key in archive.files:
+            if key == '__meta__':
+                meta = json.loads(archive[key].tobytes().decode('utf-8'))
+                continue
+            if key.startswith(_NULL_PREFIX):
+                name, _, column = key[len(_NULL_PREFIX):].partition('/')
+                null_masks.setdefault(name, {})[column] = archive[key]
+                continue
+            name, _, column = key.partition('/')
+            columns.setdefault(name, {})[column] = archive[key]
+    
+    for name, masks in null_masks.items():
+        for column, missing in masks.items():
+            values = columns[name][column].astype(object)
+            values[missing] = None
+            columns[name][column] = values
+    
+    tables = {name: pd.DataFrame(cols) for name, cols in columns.items()}
+    return meta, tables
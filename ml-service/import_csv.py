@@ -1,12 +1,29 @@
 """
 CSV Data Importer for Customer Segmentation System
-This script loads Mall Customers CSV data into MongoDB via the backend API.
+This script streams Mall Customers CSV data into MongoDB via the backend API.
+
+The CSV is read in chunks, mapped to the API schema with vectorized column
+operations and uploaded as bounded-size bulk-import batches sent in parallel.
+Failed batches are retried with backoff. After every fully acknowledged chunk
+a checkpoint is written, so an interrupted import can continue with --resume.
+
+Usage: python import_csv.py [csv_path] [--url URL] [--chunk-size N]
+                            [--batch-size N] [--parallelism N] [--retries N]
+                            [--resume] [--checkpoint PATH]
 """
 
-import pandas as pd
-import requests
+import argparse
 import json
+import os
 import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import requests
 
 # Set UTF-8 encoding for Windows
 if sys.platform == 'win32':
@@ -18,69 +35,237 @@ if sys.platform == 'win32':
 CSV_FILE_PATH = '../data/raw/Mall_Customers.csv'
 BACKEND_API_URL = 'http://localhost:5000/api/customers/bulk-import'
 
-def load_csv_to_database():
-    """Load CSV file and import to database."""
+# Accepted CSV headers for each API field, in order of preference
+COLUMN_ALIASES = {
+    'CustomerID': ['CustomerID'],
+    'Gender': ['Gender', 'Genre'],
+    'Age': ['Age'],
+    'AnnualIncome': ['Annual Income (k$)', 'AnnualIncome'],
+    'SpendingScore': ['Spending Score (1-100)', 'SpendingScore']
+}
+
+# Responses worth retrying; anything else is a permanent failure
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+class BatchFailed(Exception):
+    """Raised when a batch is still rejected after all retries."""
+
+def _find_column(chunk, field):
+    for name in COLUMN_ALIASES[field]:
+        if name in chunk.columns:
+            return chunk[name]
+    return None
+
+def _int_column(chunk, field, default=0):
+    column = _find_column(chunk, field)
+    if column is None:
+        return np.full(len(chunk), default, dtype=np.int64)
+    return pd.to_numeric(column, errors='coerce').fillna(default).astype(np.int64).to_numpy()
+
+def map_chunk(chunk, row_offset=0):
+    """
+    Map a raw CSV chunk to the bulk-import schema. Missing numeric values
+    become 0, a missing gender becomes 'Other' and a missing CustomerID
+    falls back to the 1-based row number in the file.
+    """
+    row_numbers = np.arange(row_offset + 1, row_offset + len(chunk) + 1)
     
-    print("=" * 60)
-    print("Customer Data Importer")
-    print("=" * 60)
+    customer_ids = _find_column(chunk, 'CustomerID')
+    if customer_ids is None:
+        customer_ids = row_numbers
+    else:
+        customer_ids = pd.to_numeric(customer_ids, errors='coerce').to_numpy()
+        customer_ids = np.where(np.isnan(customer_ids), row_numbers, customer_ids).astype(np.int64)
     
-    try:
-        # Read CSV file
-        print(f"\n[*] Reading CSV file: {CSV_FILE_PATH}")
-        df = pd.read_csv(CSV_FILE_PATH)
-        
-        print(f"[+] Found {len(df)} customers in CSV")
-        print(f"\nColumns: {list(df.columns)}")
-        
-        # Display first few rows
-        print("\n[*] Sample data:")
-        print(df.head())
-        
-        # Convert to required format
-        customers = []
-        for _, row in df.iterrows():
-            customer = {
-                'CustomerID': int(row.get('CustomerID', row.name + 1)),
-                'Gender': str(row.get('Gender', 'Other')),
-                'Age': int(row.get('Age', 0)),
-                'AnnualIncome': int(row.get('Annual Income (k$)', 0)),
-                'SpendingScore': int(row.get('Spending Score (1-100)', 0))
-            }
-            customers.append(customer)
-        
-        # Send to backend API
-        print(f"\n[*] Uploading {len(customers)} customers to database...")
+    gender = _find_column(chunk, 'Gender')
+    gender = (gender.fillna('Other').astype(str).to_numpy() if gender is not None
+              else np.full(len(chunk), 'Other', dtype=object))
+    
+    return pd.DataFrame({
+        'CustomerID': customer_ids,
+        'Gender': gender,
+        'Age': _int_column(chunk, 'Age'),
+        'AnnualIncome': _int_column(chunk, 'AnnualIncome'),
+        'SpendingScore': _int_column(chunk, 'SpendingScore')
+    })
+
+_thread_local = threading.local()
+
+def _session():
+    """One HTTP session (connection pool) per uploader thread."""
+    if not hasattr(_thread_local, 'session'):
+        _thread_local.session = requests.Session()
+    return _thread_local.session
+
+def post_batch(url, customers, retries=3, backoff=0.5, timeout=60):
+    """
+    POST one batch to the bulk-import endpoint, retrying connection errors
+    and 429/5xx responses with exponential backoff. Returns the stats dict.
+    """
+    body = json.dumps({'customers': customers})
+    for attempt in range(retries + 1):
+        try:
+            response = _session().post(url, data=body, timeout=timeout,
+                                       headers={'Content-Type': 'application/json'})
+            if response.status_code == 200:
+                return response.json().get('stats', {})
+            error = f'status {response.status_code}: {response.text[:200]}'
+            if response.status_code not in RETRY_STATUS_CODES:
+                break
+        except requests.RequestException as e:
+            error = str(e)
         
-        response = requests.post(
-            BACKEND_API_URL,
-            json={'customers': customers},
-            headers={'Content-Type': 'application/json'}
-        )
+        if attempt < retries:
+            time.sleep(backoff * 2 ** attempt)
+    
+    raise BatchFailed(f'Batch of {len(customers)} customers failed: {error}')
+
+def default_checkpoint_path(csv_path):
+    return f'{csv_path}.import-checkpoint.json'
+
+def read_checkpoint(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def write_checkpoint(path, checkpoint):
+    """Write the checkpoint atomically so a crash never leaves it half-written."""
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+def load_csv_to_database(csv_path=CSV_FILE_PATH, url=BACKEND_API_URL, chunk_size=10000,
+                         batch_size=1000, parallelism=4, retries=3, resume=False,
+                         checkpoint_path=None, verbose=True):
+    """
+    Stream a CSV file into the database through the bulk-import API.
+    Returns the import statistics (rows, inserted, updated, seconds, rows_per_sec).
+    """
+    log = print if verbose else (lambda *args, **kwargs: None)
+    checkpoint_path = checkpoint_path or default_checkpoint_path(csv_path)
+    
+    log("=" * 60)
+    log("Customer Data Importer")
+    log("=" * 60)
+    
+    checkpoint = {'csv_path': os.path.abspath(csv_path), 'rows_done': 0,
+                  'chunks_done': 0, 'inserted': 0, 'updated': 0}
+    if resume:
+        saved = read_checkpoint(checkpoint_path)
+        if saved is not None and saved.get('csv_path') == checkpoint['csv_path']:
+            checkpoint = saved
+            log(f"\n[*] Resuming after {checkpoint['rows_done']} rows "
+                f"({checkpoint['chunks_done']} chunks already imported)")
+    
+    rows_done_at_start = checkpoint['rows_done']
+    log(f"\n[*] Streaming CSV file: {csv_path}")
+    reader = pd.read_csv(csv_path, chunksize=chunk_size,
+                         skiprows=range(1, rows_done_at_start + 1))
+    
+    # Chunks whose batches are in flight, oldest first; a chunk is checkpointed
+    # only once it and every chunk before it have been acknowledged
+    in_flight = deque()
+    max_chunks_in_flight = max(2, -(-parallelism * batch_size // chunk_size))
+    start = time.perf_counter()
+    
+    def acknowledge_oldest():
+        n_rows, futures = in_flight.popleft()
+        for future in futures:
+            stats = future.result()
+            checkpoint['inserted'] += stats.get('inserted', 0)
+            checkpoint['updated'] += stats.get('updated', 0)
+        checkpoint['rows_done'] += n_rows
+        checkpoint['chunks_done'] += 1
+        write_checkpoint(checkpoint_path, checkpoint)
         
-        if response.status_code == 200:
-            result = response.json()
-            print("\n[SUCCESS] Import successful!")
-            print(f"Statistics:")
-            print(f"   - Inserted: {result['stats']['inserted']}")
-            print(f"   - Updated: {result['stats']['updated']}")
-            print(f"   - Total: {result['stats']['total']}")
-        else:
-            print(f"\n[ERROR] Status code: {response.status_code}")
-            print(response.text)
+        elapsed = time.perf_counter() - start
+        imported = checkpoint['rows_done'] - rows_done_at_start
+        log(f"[+] {checkpoint['rows_done']} rows imported "
+            f"({imported / max(elapsed, 1e-9):,.0f} rows/sec)")
+    
+    row_offset = rows_done_at_start
+    with ThreadPoolExecutor(max_workers=parallelism) as executor:
+        try:
+            for chunk in reader:
+                customers = map_chunk(chunk, row_offset).to_dict('records')
+                row_offset += len(chunk)
+                
+                futures = [executor.submit(post_batch, url, customers[i:i + batch_size], retries)
+                           for i in range(0, len(customers), batch_size)]
+                in_flight.append((len(chunk), futures))
+                
+                while len(in_flight) >= max_chunks_in_flight:
+                    acknowledge_oldest()
             
+            while in_flight:
+                acknowledge_oldest()
+        except BaseException:
+            # Do not start batches that are still queued; the checkpoint
+            # already covers every acknowledged chunk
+            for _, futures in in_flight:
+                for future in futures:
+                    future.cancel()
+            raise
+    
+    elapsed = time.perf_counter() - start
+    imported = checkpoint['rows_done'] - rows_done_at_start
+    
+    # Finished: a later run starts from the beginning again
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    
+    result = {
+        'rows': imported,
+        'inserted': checkpoint['inserted'],
+        'updated': checkpoint['updated'],
+        'seconds': elapsed,
+        'rows_per_sec': imported / max(elapsed, 1e-9)
+    }
+    
+    log("\n[SUCCESS] Import successful!")
+    log(f"Statistics:")
+    log(f"   - Inserted: {result['inserted']}")
+    log(f"   - Updated: {result['updated']}")
+    log(f"   - Total: {checkpoint['rows_done']}")
+    log(f"   - Throughput: {result['rows_per_sec']:,.0f} rows/sec")
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Stream a customers CSV into the database.')
+    parser.add_argument('csv_path', nargs='?', default=CSV_FILE_PATH)
+    parser.add_argument('--url', default=BACKEND_API_URL, help='bulk-import endpoint')
+    parser.add_argument('--chunk-size', type=int, default=10000, help='rows read per CSV chunk')
+    parser.add_argument('--batch-size', type=int, default=1000, help='customers per request')
+    parser.add_argument('--parallelism', type=int, default=4, help='concurrent requests')
+    parser.add_argument('--retries', type=int, default=3, help='retries per failed batch')
+    parser.add_argument('--resume', action='store_true', help='continue from the last checkpoint')
+    parser.add_argument('--checkpoint', default=None, help='checkpoint file path')
+    args = parser.parse_args(argv)
+    
+    try:
+        load_csv_to_database(
+            args.csv_path, url=args.url, chunk_size=args.chunk_size,
+            batch_size=args.batch_size, parallelism=args.parallelism,
+            retries=args.retries, resume=args.resume, checkpoint_path=args.checkpoint
+        )
+    
     except FileNotFoundError:
-        print(f"\n[ERROR] CSV file not found at {CSV_FILE_PATH}")
+        print(f"\n[ERROR] CSV file not found at {args.csv_path}")
         print("\nPlease make sure:")
         print("1. CSV file is in data/raw/ folder")
         print("2. File name is correct")
-        
-    except Exception as e:
+        return 1
+    
+    except BatchFailed as e:
         print(f"\n[ERROR] {str(e)}")
-        print("\nPlease check:")
-        print("1. Backend server is running on http://localhost:5000")
-        print("2. CSV file format is correct")
-        print("3. Required columns exist")
+        print("\nAcknowledged chunks were checkpointed; re-run with --resume to continue.")
+        print("Please check that the backend server is running on http://localhost:5000")
+        return 1
+    
+    return 0
 
 if __name__ == '__main__':
-    load_csv_to_database()
+    sys.exit(main())
@@ -0,0 +1,195 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Pipeline stages and the progress (percent) reported when each one starts
+JOB_STAGES = OrderedDict([
+    ('queued', 0),
+    ('preprocess', 5),
+    ('fit', 15),
+    ('metrics', 55),
+    ('profile', 70),
+    ('plots', 80),
+    ('save', 95),
+])
+
+class QueueFull(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+class JobCancelled(Exception):
+    """Raised inside a running job when cancellation has been requested."""
+
+class JobManager:
+    """
+    Runs long jobs on a small local thread pool and tracks their status.
+    
+    run_fn(payload, progress) does the work; it calls progress(stage) as it
+    enters each stage, which is also where cancellation takes effect.
+    At most max_pending jobs may be queued or running at once; finished jobs
+    are kept (newest max_finished) so clients can poll for the result.
+    Results are held for at most result_ttl seconds and within
+    max_result_bytes in total (sized by result_sizeof, oldest dropped
+    first); after that the job reports result_expired.
+    """
+    
+    def __init__(self, run_fn, max_workers=1, max_pending=8, max_finished=100,
+                 result_sizeof=None, max_result_bytes=256 * 1024 * 1024, result_ttl=900):
+        self.run_fn = run_fn
+        self.max_pending = max_pending
+        self.max_finished = max_finished
+        self.result_sizeof = result_sizeof
+        self.max_result_bytes = max_result_bytes
+        self.result_ttl = result_ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix='job-worker')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def _active_count(self):
+        return sum(1 for job in self._jobs.values() if job['status'] in ('queued', 'running'))
+    
+    def submit(self, payload, kind='cluster'):
+        """Queue a job and return its id. Raises QueueFull at capacity."""
+        with self._lock:
+            if self._active_count() >= self.max_pending:
+                raise QueueFull(f'Job queue is full ({self.max_pending} pending jobs)')
+            
+            job_id = uuid.uuid4().hex
+            job = {
+                'job_id': job_id,
+                'kind': kind,
+                'status': 'queued',
+                'stage': 'queued',
+                'progress': 0,
+                'created_at': time.time(),
+                'started_at': None,
+                'finished_at': None,
+                'error': None,
+                'result': None,
+                'result_bytes': 0,
+                'result_expired': False,
+                'cancel_requested': False,
+                'future': None
+            }
+            self._jobs[job_id] = job
+            self._trim()
+        
+        job['future'] = self._executor.submit(self._run, job, payload)
+        return job_id
+    
+    def _trim(self):
+        """Drop the oldest finished jobs beyond max_finished."""
+        finished = [job_id for job_id, job in self._jobs.items()
+                    if job['status'] not in ('queued', 'running')]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+        self._release_results()
+    
+    def _release_results(self):
+        """Drop results past result_ttl, then the oldest ones beyond max_result_bytes."""
+        held = [job for job in self._jobs.values() if job['result'] is not None]
+        held.sort(key=lambda job: job['finished_at'])
+        
+        now = time.time()
+        total = sum(job['result_bytes'] for job in held)
+        for job in held:
+            if now - job['finished_at'] <= self.result_ttl and total <= self.max_result_bytes:
+                continue
+            total -= job['result_bytes']
+            job['result'] = None
+            job['result_bytes'] = 0
+            job['result_expired'] = True
+    
+    def _progress(self, job, stage):
+        if job['cancel_requested']:
+            raise JobCancelled()
+        with self._lock:
+            job['stage'] = stage
+            job['progress'] = JOB_STAGES.get(stage, job['progress'])
+    
+    def _run(self, job, payload):
+        with self._lock:
+            if job['cancel_requested']:
+                return
+            job['status'] = 'running'
+            job['started_at'] = time.time()
+        
+        try:
+            result = self.run_fn(payload, lambda stage: self._progress(job, stage))
+        except JobCancelled:
+            status, result, error = 'cancelled', None, None
+        except Exception as e:
+            status, result, error = 'failed', None, str(e)
+        else:
+            status, error = 'completed', None
+        
+        result_bytes = 0
+        if result is not None and self.result_sizeof is not None:
+            result_bytes = self.result_sizeof(result)
+        
+        with self._lock:
+            job['status'] = status
+            job['result'] = result
+            job['result_bytes'] = result_bytes
+            job['error'] = error
+            job['finished_at'] = time.time()
+            if status == 'completed':
+                job['stage'] = 'done'
+                job['progress'] = 100
+            self._trim()
+    
+    def get(self, job_id):
+        """Return the job dict (including its result) or None."""
+        with self._lock:
+            self._release_results()
+            return self._jobs.get(job_id)
+    
+    def status(self, job_id):
+        """Return a JSON-serializable status snapshot without the result, or None."""
+        with self._lock:
+            self._release_results()
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return {key: job[key] for key in (
+                'job_id', 'kind', 'status', 'stage', 'progress', 'created_at',
+                'started_at', 'finished_at', 'error', 'result_expired'
+            )}
+    
+    def cancel(self, job_id):
+        """
+        Request cancellation. Queued jobs are cancelled immediately; running
+        jobs stop at their next stage boundary. Returns False if the job is
+        unknown or already finished.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job['status'] not in ('queued', 'running'):
+                return False
+            job['cancel_requested'] = True
+            if job['status'] == 'queued':
+                job['status'] = 'cancelled'
+                job['finished_at'] = time.time()
+                if job['future'] is not None:
+                    job['future'].cancel()
+        return True
+    
+    def stats(self):
+        """Return job counts by status and the queue limits."""
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job['status']] = counts.get(job['status'], 0) + 1
+            return {
+                'counts': counts,
+                'pending': self._active_count(),
+                'max_pending': self.max_pending,
+                'result_bytes': sum(job['result_bytes'] for job in self._jobs.values()),
+                'max_result_bytes': self.max_result_bytes
+            }
+    
+    def shutdown(self):
+        """Cancel queued jobs and stop accepting work."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
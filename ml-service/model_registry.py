@@ -0,0 +1,144 @@
+import os
+import threading
+import time
+
+import artifacts
+from preprocessing import DataPreprocessor
+from clustering import CustomerSegmentation
+
+
+class ModelRegistry:
+    """
+    In-process cache of fitted segmentation models and preprocessors.
+
+    Entries are keyed by algorithm and model version. Versioned artifact
+    directories (see artifacts.py) are preferred: their version is the name in
+    the CURRENT pointer and their arrays are memory-mapped, so workers share
+    them. Models saved only as pickles are versioned by the mtime and size of
+    the files. Either way a model re-saved by /api/cluster is picked up on the
+    next request without a restart.
+    """
+    
+    def __init__(self, models_dir):
+        self.models_dir = models_dir
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'loads': 0,
+            'load_time_total_ms': 0.0,
+            'load_time_last_ms': None,
+            'predictions': 0,
+            'predicted_rows': 0,
+            'predict_time_total_ms': 0.0,
+            'predict_time_last_ms': None
+        }
+    
+    def model_path(self, algorithm):
+        """Path of the pickled model for an algorithm."""
+        return os.path.join(self.models_dir, f'{algorithm}_model.pkl')
+    
+    def preprocessor_path(self):
+        """Path of the pickled preprocessor shared by all algorithms."""
+        return os.path.join(self.models_dir, 'preprocessor.pkl')
+    
+    def artifact_root(self, algorithm):
+        """Directory holding the versioned artifacts of an algorithm."""
+        return os.path.join(self.models_dir, 'artifacts', algorithm)
+    
+    def _file_version(self, path):
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+    
+    def current_version(self, algorithm):
+        """
+        Version stamp of the artifacts currently on disk for an algorithm.
+        Returns None if the model or preprocessor has not been saved yet.
+        """
+        artifact_version = artifacts.current_version(self.artifact_root(algorithm))
+        if artifact_version is not None:
+            return ('artifact', artifact_version)
+        
+        try:
+            return (self._file_version(self.model_path(algorithm)),
+                    self._file_version(self.preprocessor_path()))
+        except FileNotFoundError:
+            return None
+    
+    def get(self, algorithm):
+        """
+        Return (segmentation, preprocessor, version) for an algorithm,
+        loading from disk only when the artifacts changed since the last load.
+        Raises FileNotFoundError if the model has not been trained yet.
+        """
+        version = self.current_version(algorithm)
+        if version is None:
+            raise FileNotFoundError(f'No saved model for algorithm: {algorithm}')
+        
+        with self._lock:
+            entry = self._entries.get(algorithm)
+            if entry is not None and entry['version'] == version:
+                self._stats['hits'] += 1
+                return entry['segmentation'], entry['preprocessor'], version
+        
+        # Load outside the lock so slow unpickling does not block cache hits
+        start = time.perf_counter()
+        if version[0] == 'artifact':
+            version_dir = os.path.join(self.artifact_root(algorithm), version[1])
+            segmentation = CustomerSegmentation.load_model(artifacts.model_dir(version_dir))
+            preprocessor = DataPreprocessor.load_preprocessor(artifacts.preprocessor_dir(version_dir))
+        else:
+            segmentation = CustomerSegmentation.load_model(self.model_path(algorithm))
+            preprocessor = DataPreprocessor.load_preprocessor(self.preprocessor_path())
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        
+        with self._lock:
+            self._entries[algorithm] = {
+                'version': version,
+                'segmentation': segmentation,
+                'preprocessor': preprocessor,
+                'loaded_at': time.time()
+            }
+            self._stats['loads'] += 1
+            self._stats['load_time_total_ms'] += elapsed_ms
+            self._stats['load_time_last_ms'] = elapsed_ms
+        
+        return segmentation, preprocessor, version
+    
+    def save(self, algorithm, segmentation, preprocessor):
+        """Publish a fitted model as the algorithm's current artifact version."""
+        artifacts.publish(self.artifact_root(algorithm), segmentation, preprocessor)
+        return self.current_version(algorithm)
+    
+    def invalidate(self, algorithm=None):
+        """Drop a cached entry (or all entries) so the next get reloads."""
+        with self._lock:
+            if algorithm is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(algorithm, None)
+    
+    def record_prediction(self, elapsed_ms, n_rows=1):
+        """Record end-to-end latency of a prediction request."""
+        with self._lock:
+            self._stats['predictions'] += 1
+            self._stats['predicted_rows'] += n_rows
+            self._stats['predict_time_total_ms'] += elapsed_ms
+            self._stats['predict_time_last_ms'] = elapsed_ms
+    
+    def stats(self):
+        """Return cache and latency statistics."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['avg_load_time_ms'] = (stats['load_time_total_ms'] / stats['loads']
+                                         if stats['loads'] else None)
+            stats['avg_predict_time_ms'] = (stats['predict_time_total_ms'] / stats['predictions']
+                                            if stats['predictions'] else None)
+            stats['cached_models'] = {
+                algorithm: {
+                    'version': entry['version'],
+                    'loaded_at': entry['loaded_at']
+                }
+                for algorithm, entry in self._entries.items()
+            }
+        return stats
@@ -0,0 +1,193 @@
+import hashlib
+import numbers
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+from sklearn.neighbors import NearestNeighbors
+from sklearn.cluster import OPTICS, cluster_optics_dbscan
+
+def dataset_key(X):
+    """Fast content hash identifying a feature matrix."""
+    X = np.ascontiguousarray(X)
+    digest = hashlib.blake2b(X.view(np.uint8), digest_size=16).hexdigest()
+    return f'{digest}-{X.shape[0]}x{X.shape[1] if X.ndim > 1 else 1}-{X.dtype.str}'
+
+def restrict_radius_graph(graph, eps):
+    """
+    Keep only edges with distance <= eps from a CSR radius-neighbors graph.
+    Explicit zero distances (self loops, duplicates) are preserved.
+    """
+    mask = graph.data <= eps
+    cumulative = np.concatenate([[0], np.cumsum(mask)])
+    indptr = cumulative[graph.indptr]
+    return sparse.csr_matrix((graph.data[mask], graph.indices[mask], indptr),
+                             shape=graph.shape)
+
+def dbscan_from_graph(graph, min_samples=5):
+    """
+    DBSCAN labels from a radius-neighbors graph (self loops included).
+    
+    Core points are connected through the core-only subgraph; clusters are
+    numbered by their lowest core index and each border point joins the
+    lowest-numbered neighboring cluster, which matches sklearn's DBSCAN.
+    Returns (labels, core_sample_indices).
+    """
+    n_samples = graph.shape[0]
+    degree = np.diff(graph.indptr)
+    is_core = degree >= min_samples
+    core_indices = np.flatnonzero(is_core)
+    labels = np.full(n_samples, -1, dtype=np.intp)
+    
+    if len(core_indices) == 0:
+        return labels, core_indices
+    
+    core_graph = graph[core_indices][:, core_indices]
+    _, components = connected_components(core_graph, directed=False)
+    
+    # Renumber components in order of their first core point
+    _, first_seen = np.unique(components, return_index=True)
+    rank = np.empty(len(first_seen), dtype=np.intp)
+    rank[np.argsort(first_seen)] = np.arange(len(first_seen))
+    labels[core_indices] = rank[components]
+    
+    # Border points take the smallest cluster among their core neighbors
+    rows = np.repeat(np.arange(n_samples), degree)
+    cols = graph.indices
+    border_edges = ~is_core[rows] & is_core[cols]
+    if border_edges.any():
+        border_labels = np.full(n_samples, np.iinfo(np.intp).max, dtype=np.intp)
+        np.minimum.at(border_labels, rows[border_edges], labels[cols[border_edges]])
+        is_border = border_labels != np.iinfo(np.intp).max
+        labels[is_border] = border_labels[is_border]
+    
+    return labels, core_indices
+
+def check_dbscan_params(eps, min_samples):
+    """Validate DBSCAN parameters the way sklearn's DBSCAN does (ValueError)."""
+    if isinstance(eps, bool) or not isinstance(eps, numbers.Real) or not 0 < eps < np.inf:
+        raise ValueError(f"eps must be a float in the range (0, inf), got {eps!r}")
+    if isinstance(min_samples, bool) or not isinstance(min_samples, numbers.Integral) or min_samples < 1:
+        raise ValueError(f"min_samples must be an int in the range [1, inf), got {min_samples!r}")
+
+class NeighborGraphCache:
+    """
+    Cache of tree-based neighbor indexes and sparse radius-neighbors graphs,
+    one per dataset. A graph built for radius r answers any eps <= r by
+    filtering edges, so re-running DBSCAN with a smaller eps or a different
+    min_samples skips the radius queries entirely.
+    
+    Each graph is stored with its radius as one (graph, radius) pair under
+    the lock and only replaced by a graph of larger radius, so concurrent
+    runs never see a graph labelled with the wrong radius. Cached graphs are
+    bounded by their total number of edges (max_edges); least recently used
+    graphs are dropped first and a single graph over the bound is not kept.
+    """
+    
+    def __init__(self, max_entries=4, max_edges=20_000_000, algorithm='auto'):
+        self.max_entries = max_entries
+        self.max_edges = max_edges
+        self.algorithm = algorithm
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def _entry(self, key):
+        # Caller holds the lock
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = {'index': None, 'graph': None}
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        else:
+            self._entries.move_to_end(key)
+        return entry
+    
+    def _cached_edges(self):
+        return sum(entry['graph'][0].nnz for entry in self._entries.values()
+                   if entry['graph'] is not None)
+    
+    def _store_graph(self, key, graph, radius):
+        # Caller holds the lock
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        if entry['graph'] is not None and entry['graph'][1] >= radius:
+            return
+        if graph.nnz > self.max_edges:
+            return
+        
+        entry['graph'] = None
+        for other in self._entries.values():
+            if self._cached_edges() + graph.nnz <= self.max_edges:
+                break
+            if other['graph'] is not None:
+                other['graph'] = None
+                self.evictions += 1
+        entry['graph'] = (graph, radius)
+    
+    def radius_graph(self, X, eps):
+        """Sparse distance graph of all pairs within eps (self loops included)."""
+        key = dataset_key(X)
+        with self._lock:
+            entry = self._entry(key)
+            cached = entry['graph']
+            index = entry['index']
+            if cached is not None and cached[1] >= eps:
+                self.hits += 1
+            else:
+                cached = None
+                self.misses += 1
+        
+        if cached is not None:
+            graph, radius = cached
+            return graph if radius == eps else restrict_radius_graph(graph, eps)
+        
+        # Radius queries run outside the lock; the index is shared once built
+        if index is None:
+            index = NearestNeighbors(algorithm=self.algorithm).fit(X)
+        graph = index.radius_neighbors_graph(X, radius=eps, mode='distance').tocsr()
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry['index'] is None:
+                    entry['index'] = index
+                self._store_graph(key, graph, eps)
+        return graph
+    
+    def stats(self):
+        """Return cache hit/miss counters and cached graph sizes."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'max_edges': self.max_edges,
+                'entries': [{'radius': entry['graph'][1] if entry['graph'] is not None else 0.0,
+                             'n_edges': int(entry['graph'][0].nnz) if entry['graph'] is not None else 0}
+                            for entry in self._entries.values()]
+            }
+
+def optics_eps_sweep(X, eps_values, min_samples=5):
+    """
+    Run OPTICS once and extract DBSCAN-equivalent clusterings for many eps
+    values from the reachability plot. Returns {eps: labels}.
+    """
+    eps_values = sorted(eps_values)
+    optics = OPTICS(min_samples=min_samples, max_eps=eps_values[-1]).fit(X)
+    
+    return {
+        eps: cluster_optics_dbscan(
+            reachability=optics.reachability_,
+            core_distances=optics.core_distances_,
+            ordering=optics.ordering_,
+            eps=eps
+        )
+        for eps in eps_values
+    }
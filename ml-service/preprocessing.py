@@ -1,17 +1,111 @@
 import pandas as pd
 import numpy as np
 from sklearn.preprocessing import StandardScaler, MinMaxScaler
-from sklearn.decomposition import PCA
+from sklearn.decomposition import PCA, IncrementalPCA
 from sklearn.manifold import TSNE
+from sklearn.neighbors import NearestNeighbors
 import joblib
+import os
+import time
+
+from artifacts import is_artifact, read_part, write_part
+from rfm import compute_rfm, compute_rfm_from_csv
+
+# Above this many features 'auto' PCA uses randomized SVD instead of the covariance
+PCA_COVARIANCE_MAX_FEATURES = 1000
+
+# Rows per block when accumulating the covariance matrix
+_COVARIANCE_BLOCK_ROWS = 65536
+
+def _normalize_signs(components):
+    """Flip each component so its largest-magnitude loading is positive."""
+    signs = np.sign(components[np.arange(len(components)), np.abs(components).argmax(axis=1)])
+    signs[signs == 0] = 1
+    return components * signs[:, np.newaxis]
+
+def _covariance_pca(X, n_components):
+    """
+    Exact PCA from the eigendecomposition of the covariance matrix, which is
+    accumulated over row blocks in float64 (no centered copy of X).
+    Returns (mean, components, explained_variance_ratio).
+    """
+    n_samples, n_features = X.shape
+    mean = X.mean(axis=0, dtype=np.float64)
+    
+    scatter = np.zeros((n_features, n_features))
+    for start in range(0, n_samples, _COVARIANCE_BLOCK_ROWS):
+        block = np.asarray(X[start:start + _COVARIANCE_BLOCK_ROWS], dtype=np.float64) - mean
+        scatter += block.T @ block
+    covariance = scatter / max(n_samples - 1, 1)
+    
+    eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+    order = np.argsort(eigenvalues)[::-1][:n_components]
+    eigenvalues = np.maximum(eigenvalues, 0)
+    total = eigenvalues.sum()
+    
+    components = _normalize_signs(eigenvectors[:, order].T)
+    variance_ratio = eigenvalues[order] / total if total > 0 else np.zeros(len(order))
+    return mean, components, variance_ratio
+
+# Smallest t-SNE sample worth embedding, and the running estimate of t-SNE
+# cost per sampled point (seconds at 1000 iterations), used for time budgets
+TSNE_MIN_SAMPLE_SIZE = 200
+_tsne_seconds_per_point = 0.008
+
+def _embedding_sample(X, labels, sample_size, random_state=42):
+    """
+    Representative rows for fitting an embedding: per cluster, the rows
+    closest to the cluster mean (a quarter of its quota) plus a random pick
+    for the rest, with quotas proportional to cluster size. Without labels
+    the sample is uniform.
+    """
+    rng = np.random.RandomState(random_state)
+    if labels is None:
+        return np.sort(rng.choice(len(X), size=sample_size, replace=False))
+    
+    labels = np.asarray(labels)
+    cluster_ids, codes, sizes = np.unique(labels, return_inverse=True, return_counts=True)
+    quotas = np.minimum(np.maximum(np.round(sample_size * sizes / len(X)).astype(int), 1), sizes)
+    
+    picks = []
+    for code, quota in enumerate(quotas):
+        members = np.flatnonzero(codes == code)
+        n_central = quota // 4 if cluster_ids[code] != -1 else 0
+        if n_central > 0:
+            dist = ((X[members] - X[members].mean(axis=0)) ** 2).sum(axis=1)
+            central = members[np.argpartition(dist, n_central - 1)[:n_central]]
+        else:
+            central = members[:0]
+        others = np.setdiff1d(members, central, assume_unique=True)
+        picks.append(central)
+        picks.append(rng.choice(others, size=quota - n_central, replace=False))
+    
+    return np.sort(np.concatenate(picks))
+
+def _interpolate_embedding(X_sample, Y_sample, X_rest, n_neighbors=5, block_rows=65536):
+    """Inverse-distance weighted average of the embeddings of the nearest sampled rows."""
+    n_neighbors = min(n_neighbors, len(X_sample))
+    index = NearestNeighbors(n_neighbors=n_neighbors).fit(X_sample)
+    Y_rest = np.empty((len(X_rest), Y_sample.shape[1]))
+    for start in range(0, len(X_rest), block_rows):
+        dist, idx = index.kneighbors(X_rest[start:start + block_rows])
+        weights = 1.0 / np.maximum(dist, 1e-12)
+        weights /= weights.sum(axis=1, keepdims=True)
+        Y_rest[start:start + block_rows] = np.einsum('ij,ijk->ik', weights, Y_sample[idx])
+    return Y_rest
 
 class DataPreprocessor:
     """Handle all data preprocessing and feature engineering tasks."""
     
-    def __init__(self):
+    def __init__(self, dtype=np.float64):
+        # Feature matrix dtype; float32 halves the memory of every stage downstream
+        self.dtype = np.dtype(dtype)
         self.scaler = StandardScaler()
         self.pca = None
+        self.projection = None
         self.feature_names = []
+        self.fill_values = {}
+        self.categorical_cols = None
         
     def load_customer_data(self, filepath=None, data=None):
         """Load customer data from file or dict."""
@@ -29,125 +123,374 @@ class DataPreprocessor:
         Compute RFM (Recency, Frequency, Monetary) features from transaction data.
         
         Expected columns: CustomerID, TransactionDate, Amount
+        Recency is in days from the most recent transaction + 1 day.
+        The input frame is not modified.
         """
-        # Convert date to datetime
-        transactions_df['TransactionDate'] = pd.to_datetime(transactions_df['TransactionDate'])
+        return compute_rfm(transactions_df)
+    
+    def compute_rfm_features_from_csv(self, filepath, chunksize=1_000_000):
+        """
+        Compute RFM features from a transactions CSV too large to load at once,
+        streaming it in chunks (memory grows with customers, not transactions).
+        """
+        return compute_rfm_from_csv(filepath, chunksize=chunksize)
+    
+    def reduce_dimensions_pca(self, X, n_components=2, method='auto', random_state=42,
+                              batch_size=None):
+        """
+        Reduce dimensions using PCA for visualization.
         
-        # Reference date (most recent transaction + 1 day)
-        reference_date = transactions_df['TransactionDate'].max() + pd.Timedelta(days=1)
+        method: 'covariance' (exact, eigendecomposition of the d x d covariance
+        accumulated in one pass; best for many rows and few features),
+        'randomized' (randomized SVD), 'incremental' (IncrementalPCA in
+        batches, bounded memory), 'exact' (full SVD) or 'auto' (covariance up
+        to PCA_COVARIANCE_MAX_FEATURES features, randomized beyond).
+        The fitted basis is kept in self.projection (saved with the
+        preprocessor), so project() can map new data with one matrix multiply.
+        Component signs are normalized, making results deterministic.
+        """
+        X = np.asarray(X)
+        if method == 'auto':
+            method = 'covariance' if X.shape[1] <= PCA_COVARIANCE_MAX_FEATURES else 'randomized'
         
-        # Compute RFM
-        rfm = transactions_df.groupby('CustomerID').agg({
-            'TransactionDate': lambda x: (reference_date - x.max()).days,  # Recency
-            'CustomerID': 'count',  # Frequency
-            'Amount': 'sum'  # Monetary
-        })
+        if method == 'covariance':
+            mean, components, variance_ratio = _covariance_pca(X, n_components)
+            self.pca = None
+        elif method in ('randomized', 'exact', 'incremental'):
+            if method == 'incremental':
+                self.pca = IncrementalPCA(n_components=n_components, batch_size=batch_size)
+            else:
+                self.pca = PCA(n_components=n_components,
+                               svd_solver='randomized' if method == 'randomized' else 'full',
+                               random_state=random_state)
+            self.pca.fit(X)
+            mean = self.pca.mean_
+            components = _normalize_signs(self.pca.components_)
+            variance_ratio = self.pca.explained_variance_ratio_
+        else:
+            raise ValueError(f"Unknown PCA method: {method}")
         
-        rfm.columns = ['Recency', 'Frequency', 'Monetary']
-        rfm.reset_index(inplace=True)
+        self.projection = {
+            'method': method,
+            'mean': mean.astype(np.float64),
+            'components': components.astype(np.float64),
+            'explained_variance_ratio': np.asarray(variance_ratio, dtype=np.float64)
+        }
         
-        return rfm
+        return self.project(X), self.projection['explained_variance_ratio']
+    
+    def project(self, X):
+        """Project features onto the fitted PCA basis (a single matrix multiply)."""
+        projection = getattr(self, 'projection', None)
+        if projection is None:
+            raise ValueError("No PCA projection fitted")
+        components = projection['components'].astype(X.dtype, copy=False)
+        offset = projection['mean'].astype(X.dtype, copy=False) @ components.T
+        X_reduced = X @ components.T
+        X_reduced -= offset
+        return X_reduced
     
-    def handle_missing_values(self, df):
-        """Handle missing values in the dataset."""
-        # Fill numerical columns with median
-        numerical_cols = df.select_dtypes(include=[np.number]).columns
-        for col in numerical_cols:
-            if df[col].isnull().sum() > 0:
-                df[col].fillna(df[col].median(), inplace=True)
+    def reduce_dimensions_tsne(self, X, n_components=2, perplexity=30, random_state=42,
+                               labels=None, sample_size=None, time_budget=None,
+                               n_neighbors=5, return_info=False):
+        """
+        Reduce dimensions using t-SNE for visualization.
         
-        # Fill categorical with mode
-        categorical_cols = df.select_dtypes(include=['object']).columns
-        for col in categorical_cols:
-            if df[col].isnull().sum() > 0:
-                df[col].fillna(df[col].mode()[0], inplace=True)
+        Without sample_size or time_budget every point is embedded (the
+        original behaviour). Otherwise t-SNE is fitted on a representative
+        sample - the points nearest each cluster's center plus a stratified
+        pick per cluster when labels are given - and the remaining points are
+        placed by inverse-distance interpolation between the embeddings of
+        their n_neighbors nearest sampled points. time_budget (seconds) picks
+        the largest sample expected to fit, from the measured t-SNE speed.
+        With return_info, returns (X_reduced, info).
+        """
+        global _tsne_seconds_per_point
+        X = np.asarray(X)
+        start = time.perf_counter()
         
-        return df
-    
-    def encode_categorical(self, df):
-        """One-hot encode categorical variables."""
-        categorical_cols = df.select_dtypes(include=['object']).columns
-        categorical_cols = [col for col in categorical_cols if col not in ['CustomerID']]
+        if time_budget is not None:
+            budget_size = int(time_budget / _tsne_seconds_per_point)
+            sample_size = budget_size if sample_size is None else min(sample_size, budget_size)
+        if sample_size is not None:
+            sample_size = max(sample_size, TSNE_MIN_SAMPLE_SIZE)
         
-        if len(categorical_cols) > 0:
-            df = pd.get_dummies(df, columns=categorical_cols, drop_first=True)
+        if sample_size is None or sample_size >= len(X):
+            sample = np.arange(len(X))
+        else:
+            sample = _embedding_sample(X, labels, sample_size, random_state)
         
-        return df
+        tsne = TSNE(n_components=n_components,
+                    perplexity=min(perplexity, max(len(sample) - 1, 1) / 3),
+                    random_state=random_state, n_iter=1000, init='pca', learning_rate='auto')
+        fit_start = time.perf_counter()
+        X_sample_reduced = tsne.fit_transform(X[sample])
+        fit_seconds = time.perf_counter() - fit_start
+        
+        # Keep the speed estimate current for the next time budget
+        _tsne_seconds_per_point = 0.5 * _tsne_seconds_per_point + 0.5 * fit_seconds / len(sample)
+        
+        if len(sample) == len(X):
+            X_reduced = X_sample_reduced
+        else:
+            X_reduced = np.empty((len(X), n_components))
+            X_reduced[sample] = X_sample_reduced
+            rest = np.setdiff1d(np.arange(len(X)), sample, assume_unique=True)
+            X_reduced[rest] = _interpolate_embedding(X[sample], X_sample_reduced, X[rest],
+                                                     n_neighbors)
+        
+        if not return_info:
+            return X_reduced
+        return X_reduced, {
+            'method': 'tsne',
+            'total_points': len(X),
+            'sample_size': len(sample),
+            'interpolated_points': len(X) - len(sample),
+            'fit_seconds': round(fit_seconds, 3),
+            'seconds': round(time.perf_counter() - start, 3)
+        }
     
-    def log_transform_skewed(self, df, skew_threshold=1.0):
-        """Apply log transformation to highly skewed features."""
-        numerical_cols = df.select_dtypes(include=[np.number]).columns
+    def fit(self, df, exclude_cols=None, categorical_features=False, log_skewed=False,
+            skew_threshold=1.0):
+        """
+        Learn the preprocessing plan from training data without transforming it:
+        fill values (numeric medians, categorical modes), category vocabularies,
+        which columns get a log1p transform and the scaler statistics.
         
-        for col in numerical_cols:
-            skewness = df[col].skew()
-            if abs(skewness) > skew_threshold and (df[col] >= 0).all():
-                df[col] = np.log1p(df[col])  # log(1 + x) to handle zeros
+        Features are the numeric columns (minus ID-like columns), followed by
+        one-hot columns (first category dropped) when categorical_features is set.
+        With pandas >= 2 get_dummies returns bool columns, which the previous
+        select_dtypes-based pipeline left out, so they are opt-in here.
+        """
+        self._learn_plan(df, exclude_cols, categorical_features, log_skewed, skew_threshold)
         
-        return df
+        # Scaler statistics come from the unscaled feature matrix
+        self._fit_scaler(self._feature_matrix(df, self.dtype))
+        return self
     
-    def standardize_features(self, df, feature_cols=None):
-        """Standardize features using StandardScaler."""
-        if feature_cols is None:
-            # Auto-detect numerical columns
-            feature_cols = df.select_dtypes(include=[np.number]).columns.tolist()
-            # Exclude ID columns
-            feature_cols = [col for col in feature_cols if 'ID' not in col.upper()]
+    def _learn_plan(self, df, exclude_cols=None, categorical_features=False, log_skewed=False,
+                    skew_threshold=1.0):
+        """Learn fill values, vocabularies, log columns and the feature layout."""
+        if exclude_cols is None:
+            exclude_cols = ['CustomerID', 'ClusterID', 'ClusterLabel']
+        # Classify columns from their dtypes (select_dtypes would copy the frame)
+        dtypes = df.dtypes
+        columns = [col for col in df.columns if col not in exclude_cols]
+        numerical_cols = [col for col in columns if pd.api.types.is_numeric_dtype(dtypes[col])
+                          and not pd.api.types.is_bool_dtype(dtypes[col])]
+        categorical_cols = [col for col in columns
+                            if dtypes[col] == object and col != 'CustomerID']
+        
+        self.fill_values = {col: df[col].median() for col in numerical_cols}
+        for col in categorical_cols:
+            mode = df[col].mode()
+            if len(mode) > 0:
+                self.fill_values[col] = mode[0]
+        self.categorical_cols = categorical_cols
+        
+        self.numeric_cols = [col for col in numerical_cols if 'ID' not in col.upper()]
         
-        self.feature_names = feature_cols
+        self.log_cols = []
+        if log_skewed:
+            for col in self.numeric_cols:
+                values = df[col].fillna(self.fill_values[col])
+                if abs(values.skew()) > skew_threshold and (values >= 0).all():
+                    self.log_cols.append(col)
         
-        # Fit and transform
-        df_scaled = df.copy()
-        df_scaled[feature_cols] = self.scaler.fit_transform(df[feature_cols])
+        # Sorted vocabularies as get_dummies builds them, minus the first category
+        self.category_vocab = {}
+        if categorical_features:
+            for col in categorical_cols:
+                categories = sorted(df[col].fillna(self.fill_values.get(col)).dropna().unique())
+                kept = [cat for cat in categories[1:] if 'ID' not in f'{col}_{cat}'.upper()]
+                if kept:
+                    self.category_vocab[col] = kept
         
-        return df_scaled, feature_cols
+        self.feature_names = self.numeric_cols + [
+            f'{col}_{cat}' for col, categories in self.category_vocab.items() for cat in categories
+        ]
+    
+    def _fit_scaler(self, X):
+        self.scaler = StandardScaler()
+        self.scaler.fit(X)
+    
+    def _scale(self, X):
+        """Standardize a feature matrix in place with the fitted scaler statistics."""
+        X -= self.scaler.mean_.astype(X.dtype, copy=False)
+        X /= self.scaler.scale_.astype(X.dtype, copy=False)
+        return X
     
-    def reduce_dimensions_pca(self, X, n_components=2):
-        """Reduce dimensions using PCA for visualization."""
-        self.pca = PCA(n_components=n_components)
-        X_reduced = self.pca.fit_transform(X)
+    def _feature_matrix(self, df, dtype):
+        """Fill a preallocated (n_rows, n_features) matrix with unscaled features."""
+        X = np.empty((len(df), len(self.feature_names)), dtype=dtype)
         
-        variance_explained = self.pca.explained_variance_ratio_
+        for j, col in enumerate(self.numeric_cols):
+            out = X[:, j]
+            fill = self.fill_values[col]
+            if col in df.columns:
+                values = df[col]
+                if values.dtype == object:
+                    values = pd.to_numeric(values, errors='coerce')
+                out[:] = values.to_numpy(dtype=np.float64, na_value=np.nan)
+                np.copyto(out, fill, where=np.isnan(out))
+            else:
+                out[:] = fill
+            if col in self.log_cols:
+                np.log1p(out, out=out)
         
-        return X_reduced, variance_explained
+        # One-hot blocks: category codes index straight into the block
+        offset = len(self.numeric_cols)
+        for col, categories in self.category_vocab.items():
+            block = X[:, offset:offset + len(categories)]
+            block[:] = 0
+            if col in df.columns:
+                values = df[col].fillna(self.fill_values.get(col))
+                codes = pd.Categorical(values, categories=categories).codes
+            else:
+                codes = pd.Categorical([self.fill_values.get(col)] * len(df),
+                                       categories=categories).codes
+            rows = np.flatnonzero(codes >= 0)
+            block[rows, codes[rows]] = 1
+            offset += len(categories)
+        
+        return X
     
-    def reduce_dimensions_tsne(self, X, n_components=2, perplexity=30, random_state=42):
-        """Reduce dimensions using t-SNE for visualization."""
-        tsne = TSNE(n_components=n_components, perplexity=perplexity, 
-                    random_state=random_state, n_iter=1000)
-        X_reduced = tsne.fit_transform(X)
+    def prepare_for_clustering(self, df, exclude_cols=None, categorical_features=False,
+                               log_skewed=False):
+        """
+        Complete preprocessing pipeline for clustering: fit the plan on df,
+        then transform df with it. Returns (X, feature_names, customer_ids).
+        """
+        self.fit(df, exclude_cols, categorical_features, log_skewed)
+        return self.transform(df)
+    
+    def transform(self, df, exclude_cols=None, dtype=None):
+        """
+        Transform data with the plan learned by fit, in one pass into a
+        preallocated matrix. Nothing is refitted: missing values and missing
+        columns use the training medians/modes, categories map onto the
+        training vocabulary and the fitted scaler statistics are reused,
+        so the feature layout always matches training.
+        dtype defaults to the preprocessor's dtype.
+        Returns (X, feature_names, customer_ids).
+        """
+        if not self.feature_names or not hasattr(self.scaler, 'mean_'):
+            raise ValueError("Preprocessor not fitted yet")
         
-        return X_reduced
+        customer_ids = df['CustomerID'].values if 'CustomerID' in df.columns else None
+        
+        # Preprocessors pickled before fit() existed have no plan
+        if getattr(self, 'numeric_cols', None) is None:
+            return self._transform_legacy(df, exclude_cols), self.feature_names, customer_ids
+        
+        if dtype is None:
+            dtype = getattr(self, 'dtype', np.float64)
+        X = self._scale(self._feature_matrix(df, dtype))
+        
+        return X, self.feature_names, customer_ids
     
-    def prepare_for_clustering(self, df, exclude_cols=None):
-        """Complete preprocessing pipeline for clustering."""
+    def _transform_legacy(self, df, exclude_cols=None):
+        """Transform for preprocessors saved by versions without fit()."""
         if exclude_cols is None:
             exclude_cols = ['CustomerID', 'ClusterID', 'ClusterLabel']
         
-        # Store customer IDs
-        customer_ids = df['CustomerID'].values if 'CustomerID' in df.columns else None
+        df_clean = df.drop(columns=[col for col in exclude_cols if col in df.columns])
         
-        # Remove excluded columns
-        df_clean = df.copy()
-        for col in exclude_cols:
-            if col in df_clean.columns:
-                df_clean = df_clean.drop(columns=[col])
+        fill_values = {col: value for col, value in getattr(self, 'fill_values', {}).items()
+                       if col in df_clean.columns}
+        if fill_values:
+            df_clean = df_clean.fillna(fill_values)
         
-        # Handle missing values
-        df_clean = self.handle_missing_values(df_clean)
-        
-        # Encode categorical
-        df_clean = self.encode_categorical(df_clean)
+        # drop_first is not used here: the dropped baseline category is
+        # simply absent from feature_names
+        categorical_cols = getattr(self, 'categorical_cols', None)
+        if categorical_cols is None:
+            categorical_cols = [col for col in df_clean.select_dtypes(include=['object']).columns
+                                if col not in ['CustomerID']]
+        categorical_cols = [col for col in categorical_cols if col in df_clean.columns]
+        if len(categorical_cols) > 0:
+            df_clean = pd.get_dummies(df_clean, columns=categorical_cols)
         
-        # Standardize
-        df_scaled, feature_cols = self.standardize_features(df_clean)
+        df_features = df_clean.reindex(columns=self.feature_names, fill_value=0).astype(float)
+        return self.scaler.transform(df_features)
+    
+    def convert_scaled(self, X, source):
+        """
+        Map standardized features from another fitted preprocessor's space
+        into this one's (undo the source scaling, apply this one), e.g. to
+        reuse a previous model's centers. Raises ValueError when the feature
+        layouts differ.
+        """
+        if (list(source.feature_names) != list(self.feature_names)
+                or getattr(source, 'log_cols', None) != self.log_cols):
+            raise ValueError("Feature layouts differ")
         
-        return df_scaled[feature_cols].values, feature_cols, customer_ids
+        X = np.asarray(X, dtype=np.float64) * source.scaler.scale_ + source.scaler.mean_
+        return (X - self.scaler.mean_) / self.scaler.scale_
     
     def save_preprocessor(self, filepath='preprocessor.pkl'):
         """Save the fitted preprocessor."""
         joblib.dump(self, filepath)
     
+    def save_artifact(self, directory):
+        """
+        Save the fitted plan as an artifact directory: scaler statistics and
+        the PCA basis as .npy arrays, column layout, fill values and category
+        vocabularies in the JSON manifest.
+        """
+        if getattr(self, 'numeric_cols', None) is None or not hasattr(self.scaler, 'mean_'):
+            raise ValueError("Only preprocessors fitted with fit() can be saved as artifacts")
+        
+        projection = self.projection or {}
+        write_part(directory, 'preprocessor',
+                   meta={
+                       'dtype': self.dtype.name,
+                       'feature_names': self.feature_names,
+                       'numeric_cols': self.numeric_cols,
+                       'log_cols': self.log_cols,
+                       'categorical_cols': self.categorical_cols,
+                       'category_vocab': self.category_vocab,
+                       'fill_values': self.fill_values,
+                       'projection_method': projection.get('method')
+                   },
+                   arrays={
+                       'scaler_mean': self.scaler.mean_,
+                       'scaler_scale': self.scaler.scale_,
+                       'projection_mean': projection.get('mean'),
+                       'projection_components': projection.get('components'),
+                       'projection_explained_variance_ratio': projection.get('explained_variance_ratio')
+                   })
+    
     @staticmethod
-    def load_preprocessor(filepath='preprocessor.pkl'):
-        """Load a saved preprocessor."""
+    def _load_artifact(directory, mmap_mode='r'):
+        meta, arrays = read_part(directory, 'preprocessor', mmap_mode=mmap_mode)
+        preprocessor = DataPreprocessor(dtype=meta['dtype'])
+        for name in ['feature_names', 'numeric_cols', 'log_cols', 'categorical_cols',
+                     'category_vocab', 'fill_values']:
+            setattr(preprocessor, name, meta[name])
+        
+        # transform only needs the scaler statistics
+        preprocessor.scaler.mean_ = arrays['scaler_mean']
+        preprocessor.scaler.scale_ = arrays['scaler_scale']
+        preprocessor.scaler.n_features_in_ = len(arrays['scaler_mean'])
+        
+        if meta['projection_method'] is not None:
+            preprocessor.projection = {
+                'method': meta['projection_method'],
+                'mean': arrays['projection_mean'],
+                'components': arrays['projection_components'],
+                'explained_variance_ratio': arrays['projection_explained_variance_ratio']
+            }
+        return preprocessor
+    
+    @staticmethod
+    def load_preprocessor(filepath='preprocessor.pkl', mmap_mode='r'):
+        """
+        Load a saved preprocessor: a pickle written by save_preprocessor, or an
+        artifact directory written by save_artifact.
+        """
+        if os.path.isdir(filepath):
+            if not is_artifact(filepath):
+                raise FileNotFoundError(f'No preprocessor artifact in {filepath}')
+            return DataPreprocessor._load_artifact(filepath, mmap_mode=mmap_mode)
         return joblib.load(filepath)
@@ -0,0 +1,82 @@
+"""
+RFM (Recency, Frequency, Monetary) feature computation.
+
+Transactions are reduced to per-customer partial aggregates (last purchase
+date, transaction count, amount sum) using built-in groupby reductions only.
+Partial aggregates merge associatively, so a transactions file can be
+streamed in chunks with memory proportional to the number of customers.
+"""
+
+import pandas as pd
+
+RFM_COLUMNS = ['CustomerID', 'TransactionDate', 'Amount']
+
+def rfm_aggregates(transactions_df, date_format=None):
+    """
+    Per-customer partial aggregates of a transactions frame, indexed by
+    CustomerID: LastDate (max), Frequency (count) and Monetary (sum).
+    The input frame is not modified.
+    """
+    dates = pd.to_datetime(transactions_df['TransactionDate'], format=date_format)
+    frame = pd.DataFrame({
+        'CustomerID': transactions_df['CustomerID'].to_numpy(),
+        'TransactionDate': dates.to_numpy(),
+        'Amount': transactions_df['Amount'].to_numpy()
+    })
+    
+    return frame.groupby('CustomerID', sort=False).agg(
+        LastDate=('TransactionDate', 'max'),
+        Frequency=('TransactionDate', 'size'),
+        Monetary=('Amount', 'sum')
+    )
+
+def merge_rfm_aggregates(*aggregates):
+    """Combine partial aggregates computed over disjoint sets of transactions."""
+    combined = pd.concat(aggregates)
+    return combined.groupby(level=0, sort=False).agg(
+        LastDate=('LastDate', 'max'),
+        Frequency=('Frequency', 'sum'),
+        Monetary=('Monetary', 'sum')
+    )
+
+def finalize_rfm(aggregates, reference_date=None):
+    """
+    Turn aggregates into RFM features. Recency is measured in days from
+    reference_date (default: the most recent transaction + 1 day).
+    """
+    if reference_date is None:
+        reference_date = aggregates['LastDate'].max() + pd.Timedelta(days=1)
+    else:
+        reference_date = pd.Timestamp(reference_date)
+    
+    rfm = pd.DataFrame({
+        'Recency': (reference_date - aggregates['LastDate']).dt.days,
+        'Frequency': aggregates['Frequency'],
+        'Monetary': aggregates['Monetary']
+    }, index=aggregates.index)
+    
+    rfm.index.name = 'CustomerID'
+    return rfm.sort_index().reset_index()
+
+def compute_rfm(transactions_df, reference_date=None, date_format=None):
+    """RFM features for an in-memory transactions frame."""
+    return finalize_rfm(rfm_aggregates(transactions_df, date_format=date_format),
+                        reference_date=reference_date)
+
+def compute_rfm_from_csv(filepath, chunksize=1_000_000, reference_date=None,
+                         date_format=None, **read_csv_kwargs):
+    """
+    RFM features for a transactions CSV streamed in chunks. Only the
+    CustomerID, TransactionDate and Amount columns are read, and each
+    chunk is folded into the running per-customer aggregates.
+    """
+    aggregates = None
+    reader = pd.read_csv(filepath, usecols=RFM_COLUMNS, chunksize=chunksize, **read_csv_kwargs)
+    for chunk in reader:
+        partial = rfm_aggregates(chunk, date_format=date_format)
+        aggregates = partial if aggregates is None else merge_rfm_aggregates(aggregates, partial)
+    
+    if aggregates is None:
+        return pd.DataFrame(columns=['CustomerID', 'Recency', 'Frequency', 'Monetary'])
+    
+    return finalize_rfm(aggregates, reference_date=reference_date)
@@ -0,0 +1,248 @@
+import json
+import os
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+
+from artifacts import new_version_name
+from rfm import rfm_aggregates
+
+_ARRAYS = ['customer_ids', 'last_date', 'frequency', 'monetary']
+_CURRENT_FILE = 'CURRENT'
+
+class RFMStore:
+    """
+    Persistent per-customer RFM state kept in parallel numpy arrays sorted by
+    CustomerID: last purchase date, transaction count and amount sum.
+    
+    A batch of new transactions is reduced to per-customer aggregates and
+    merged with binary-search lookups, so an update costs O(batch log n)
+    instead of recomputing the full history. Unseen customers are collected
+    in a small sorted tail that is merged into the main arrays once it
+    grows past a fraction of them, keeping inserts amortized.
+    Snapshots are plain .npy files loaded memory-mapped (copy-on-write).
+    Each snapshot goes to a new versioned directory named by a CURRENT
+    file, so the files a live store has mapped are never renamed or
+    overwritten (which Windows refuses).
+    """
+    
+    def __init__(self, compact_ratio=0.1, min_compact_size=4096):
+        self.compact_ratio = compact_ratio
+        self.min_compact_size = min_compact_size
+        self._main = self._empty()
+        self._tail = self._empty()
+        self._lock = threading.Lock()
+        self.dirty = False
+        # Incremented by every update, to tell whether a snapshot is complete
+        self._version = 0
+        # Snapshot directory the main arrays are mapped from, if any
+        self._mapped_dir = None
+    
+    @staticmethod
+    def _empty():
+        return {
+            'customer_ids': np.empty(0, dtype=np.int64),
+            'last_date': np.empty(0, dtype='datetime64[ns]'),
+            'frequency': np.empty(0, dtype=np.int64),
+            'monetary': np.empty(0, dtype=np.float64)
+        }
+    
+    def __len__(self):
+        return len(self._main['customer_ids']) + len(self._tail['customer_ids'])
+    
+    @staticmethod
+    def _locate(part, ids):
+        """Positions of ids in a sorted part, plus a mask of the ids present."""
+        keys = part['customer_ids']
+        positions = np.searchsorted(keys, ids)
+        found = positions < len(keys)
+        found[found] = keys[positions[found]] == ids[found]
+        return positions, found
+    
+    @staticmethod
+    def _absorb(part, positions, batch, mask):
+        """Fold batch aggregates into existing entries of a part."""
+        pos = positions[mask]
+        part['last_date'][pos] = np.maximum(part['last_date'][pos], batch['last_date'][mask])
+        part['frequency'][pos] += batch['frequency'][mask]
+        part['monetary'][pos] += batch['monetary'][mask]
+    
+    @staticmethod
+    def _merge_sorted(left, right):
+        """Merge two parts with disjoint customer ids into one sorted part."""
+        merged = {name: np.concatenate([left[name], right[name]]) for name in _ARRAYS}
+        order = np.argsort(merged['customer_ids'], kind='stable')
+        return {name: merged[name][order] for name in _ARRAYS}
+    
+    def update(self, transactions_df, date_format=None):
+        """
+        Absorb new transactions (CustomerID, TransactionDate, Amount).
+        Returns the number of customers touched.
+        """
+        aggregates = rfm_aggregates(transactions_df, date_format=date_format)
+        if len(aggregates) == 0:
+            return 0
+        
+        batch = {
+            'customer_ids': aggregates.index.to_numpy(dtype=np.int64),
+            'last_date': aggregates['LastDate'].to_numpy(dtype='datetime64[ns]'),
+            'frequency': aggregates['Frequency'].to_numpy(dtype=np.int64),
+            'monetary': aggregates['Monetary'].to_numpy(dtype=np.float64)
+        }
+        
+        with self._lock:
+            main_pos, in_main = self._locate(self._main, batch['customer_ids'])
+            self._absorb(self._main, main_pos, batch, in_main)
+            
+            tail_pos, in_tail = self._locate(self._tail, batch['customer_ids'])
+            in_tail &= ~in_main
+            self._absorb(self._tail, tail_pos, batch, in_tail)
+            
+            new = ~(in_main | in_tail)
+            if new.any():
+                new_part = {name: batch[name][new] for name in _ARRAYS}
+                self._tail = self._merge_sorted(self._tail, new_part)
+            
+            threshold = max(self.min_compact_size,
+                            self.compact_ratio * len(self._main['customer_ids']))
+            if len(self._tail['customer_ids']) > threshold:
+                self._compact()
+            
+            self.dirty = True
+            self._version += 1
+        
+        return len(batch['customer_ids'])
+    
+    def _compact(self):
+        if len(self._tail['customer_ids']) > 0:
+            self._main = self._merge_sorted(self._main, self._tail)
+            self._tail = self._empty()
+    
+    def _state(self, customer_ids=None):
+        """Sorted arrays for all customers, or for the given ids (missing ones dropped)."""
+        return self._versioned_state(customer_ids)[0]
+    
+    def _versioned_state(self, customer_ids=None):
+        """_state plus the update version it reflects."""
+        with self._lock:
+            if customer_ids is None:
+                self._compact()
+                return {name: self._main[name].copy() for name in _ARRAYS}, self._version
+            
+            ids = np.unique(np.asarray(customer_ids, dtype=np.int64))
+            found_parts = []
+            for part in (self._main, self._tail):
+                positions, found = self._locate(part, ids)
+                found_parts.append({name: part[name][positions[found]] for name in _ARRAYS})
+            return self._merge_sorted(*found_parts), self._version
+    
+    def max_date(self):
+        """Most recent transaction date seen, or None for an empty store."""
+        with self._lock:
+            dates = [part['last_date'].max() for part in (self._main, self._tail)
+                     if len(part['last_date'])]
+        return pd.Timestamp(max(dates)) if dates else None
+    
+    def features(self, customer_ids=None, reference_date=None):
+        """
+        RFM features (CustomerID, Recency, Frequency, Monetary), matching
+        compute_rfm over the full history. Recency is in days from
+        reference_date (default: the most recent transaction + 1 day).
+        """
+        if reference_date is None:
+            latest = self.max_date()
+            reference_date = latest + pd.Timedelta(days=1) if latest is not None else pd.Timestamp.now()
+        reference = np.datetime64(pd.Timestamp(reference_date), 'ns')
+        
+        state = self._state(customer_ids)
+        return pd.DataFrame({
+            'CustomerID': state['customer_ids'],
+            'Recency': ((reference - state['last_date']) // np.timedelta64(1, 'D')).astype(np.int64),
+            'Frequency': state['frequency'],
+            'Monetary': state['monetary']
+        })
+    
+    def save(self, directory):
+        """
+        Snapshot the store as .npy files in a new directory under directory,
+        then point CURRENT at it, so readers never see a partial snapshot.
+        Updates made while the files are written keep the store dirty.
+        """
+        state, version = self._versioned_state()
+        os.makedirs(directory, exist_ok=True)
+        
+        name = new_version_name()
+        tmp_dir = os.path.join(directory, f'.{name}.tmp')
+        os.makedirs(tmp_dir)
+        for array_name in _ARRAYS:
+            np.save(os.path.join(tmp_dir, f'{array_name}.npy'), state[array_name])
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+            json.dump({'n_customers': int(len(state['customer_ids']))}, f)
+        os.replace(tmp_dir, os.path.join(directory, name))
+        
+        pointer_tmp = os.path.join(directory, f'{_CURRENT_FILE}.{name}.tmp')
+        with open(pointer_tmp, 'w') as f:
+            f.write(name)
+        os.replace(pointer_tmp, os.path.join(directory, _CURRENT_FILE))
+        
+        with self._lock:
+            if self._version == version:
+                self.dirty = False
+            keep = {name, self._mapped_dir}
+        self._prune(directory, keep)
+    
+    @staticmethod
+    def _prune(directory, keep):
+        """Remove old snapshots; files still mapped elsewhere may fail to delete and are retried later."""
+        for entry in os.listdir(directory):
+            path = os.path.join(directory, entry)
+            if entry not in keep and os.path.isdir(path) and not entry.startswith('.'):
+                shutil.rmtree(path, ignore_errors=True)
+    
+    @staticmethod
+    def _snapshot_dir(directory):
+        """Directory of the current snapshot, or None."""
+        try:
+            with open(os.path.join(directory, _CURRENT_FILE)) as f:
+                name = f.read().strip()
+        except FileNotFoundError:
+            name = None
+        if name and os.path.exists(os.path.join(directory, name, 'meta.json')):
+            return os.path.join(directory, name)
+        return None
+    
+    @classmethod
+    def load(cls, directory, mmap_mode='c', **kwargs):
+        """
+        Load the current snapshot. With mmap_mode='c' the arrays are mapped
+        copy-on-write: loading is near-instant and updates never modify the
+        snapshot files.
+        """
+        store = cls(**kwargs)
+        snapshot_dir = cls._snapshot_dir(directory)
+        if snapshot_dir is None:
+            raise FileNotFoundError(f'No RFM snapshot in {directory}')
+        
+        store._main = {name: np.load(os.path.join(snapshot_dir, f'{name}.npy'), mmap_mode=mmap_mode)
+                       for name in _ARRAYS}
+        store._mapped_dir = os.path.basename(snapshot_dir)
+        return store
+    
+    @classmethod
+    def load_or_create(cls, directory, **kwargs):
+        """Load the snapshot in directory, or start an empty store."""
+        try:
+            return cls.load(directory, **kwargs)
+        except FileNotFoundError:
+            return cls(**kwargs)
+    
+    def stats(self):
+        """Return customer counts and whether there are unsaved updates."""
+        with self._lock:
+            return {
+                'customers': len(self._main['customer_ids']) + len(self._tail['customer_ids']),
+                'tail_customers': len(self._tail['customer_ids']),
+                'dirty': self.dirty
+            }
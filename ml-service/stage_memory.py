@@ -0,0 +1,63 @@
+import threading
+import tracemalloc
+
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+_tracing_owned = False
+
+def _start_tracing():
+    global _tracing_users, _tracing_owned
+    with _tracing_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracing_owned = True
+        _tracing_users += 1
+
+def _stop_tracing():
+    global _tracing_users, _tracing_owned
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0 and _tracing_owned:
+            tracemalloc.stop()
+            _tracing_owned = False
+
+class StageMemoryTracker:
+    """
+    Peak traced memory per pipeline stage, via tracemalloc (numpy buffers
+    are included). Call enter(stage) at the start of each stage and finish()
+    at the end. Figures are relative to when the tracker started; tracing is
+    process-wide, so runs that overlap in time distort each other's figures.
+    """
+    
+    def __init__(self):
+        _start_tracing()
+        self.baseline = tracemalloc.get_traced_memory()[0]
+        self.stages = {}
+        self._current = None
+        self._finished = False
+    
+    def _close_stage(self):
+        if self._current is None:
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        self.stages[self._current] = {
+            'peak_mb': round(max(peak - self.baseline, 0) / 2 ** 20, 2),
+            'end_mb': round(max(current - self.baseline, 0) / 2 ** 20, 2)
+        }
+        self._current = None
+    
+    def enter(self, stage):
+        """Close the current stage and start measuring the next one."""
+        if self._finished:
+            return
+        self._close_stage()
+        tracemalloc.reset_peak()
+        self._current = stage
+    
+    def finish(self):
+        """Stop tracking and return {stage: {'peak_mb', 'end_mb'}}."""
+        if not self._finished:
+            self._close_stage()
+            self._finished = True
+            _stop_tracing()
+        return self.stages
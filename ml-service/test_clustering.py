@@ -0,0 +1,30 @@
+import numpy as np
+
+from clustering import CustomerSegmentation
+
+def _blobs(centers, n_per_blob=200, scale=0.1, random_state=0):
+    rng = np.random.RandomState(random_state)
+    return np.vstack([rng.normal(center, scale, size=(n_per_blob, len(center)))
+                      for center in centers])
+
+def test_birch_with_fewer_subclusters_than_clusters_has_no_phantom_centers():
+    X = _blobs([[10, 10], [20, 20], [30, 30]])
+    seg = CustomerSegmentation(metrics_mode='exact')
+    seg.fit_hierarchical(X, n_clusters=5, method='birch', birch_threshold=1.0)
+    
+    assert list(seg.cluster_ids) == list(np.unique(seg.labels))
+    assert len(seg.cluster_centers) == len(seg.cluster_ids) == 3
+    # The origin is far from every blob; it must go to a real cluster
+    assert seg.predict_cluster(np.array([[0.0, 0.0]]))[0] in seg.cluster_ids
+
+def test_knn_joins_disconnected_components_without_dense_fallback(monkeypatch):
+    import sklearn.cluster._agglomerative as agglomerative
+    
+    def fail(*args, **kwargs):
+        raise AssertionError('connectivity graph should already be connected')
+    
+    monkeypatch.setattr(agglomerative, '_fix_connected_components', fail)
+    X = _blobs([[0, 0], [100, 100], [200, 200]])
+    seg = CustomerSegmentation(metrics_mode='exact')
+    labels = seg.fit_hierarchical(X, n_clusters=3, method='knn', n_neighbors=5)
+    assert sorted(np.bincount(labels)) == [200, 200, 200]
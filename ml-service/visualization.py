@@ -6,12 +6,18 @@ import numpy as np
 import pandas as pd
 from io import BytesIO
 import base64
+import multiprocessing
+import os
 
 # Set style
 sns.set_style("whitegrid")
 plt.rcParams['figure.figsize'] = (10, 6)
 plt.rcParams['figure.dpi'] = 100
 
+# Plots that can be rendered on demand from a stored clustering result
+RESULT_PLOT_NAMES = ['clusters_2d', 'feature_distributions', 'cluster_profiles', 'correlation_heatmap']
+PLOT_2D_MODES = ['auto', 'scatter', 'sample', 'density']
+
 class ClusterVisualizer:
     """Generate visualizations for cluster analysis."""
     
@@ -46,30 +52,72 @@ class ClusterVisualizer:
         
         return self._fig_to_base64(fig)
     
-    def plot_clusters_2d(self, X_reduced, labels, title="Cluster Visualization"):
-        """Plot clusters in 2D space (after PCA/t-SNE)."""
-        fig, ax = plt.subplots(figsize=(12, 8))
-        
-        unique_labels = set(labels)
-        n_clusters = len(unique_labels) - (1 if -1 in unique_labels else 0)
+    def plot_clusters_2d(self, X_reduced, labels, title="Cluster Visualization",
+                         mode='auto', max_points=20000, return_info=False, random_state=42):
+        """
+        Plot clusters in 2D space (after PCA/t-SNE).
+        
+        mode:
+            'scatter' - every point as a marker.
+            'sample' - stratified downsample to about max_points, keeping a
+                minimum number of points from every cluster and from noise.
+            'density' - per-cluster 2D histograms on a shared grid, each bin
+                colored by its dominant cluster with opacity from log density.
+            'auto' - 'scatter' up to max_points, 'sample' above.
+        With return_info, returns (image, info) where info reports how many
+        points were actually drawn.
+        """
+        labels = np.asarray(labels)
+        n_points = len(labels)
+        if mode == 'auto':
+            mode = 'scatter' if n_points <= max_points else 'sample'
         
-        colors = sns.color_palette("husl", n_clusters)
+        fig, ax = plt.subplots(figsize=(12, 8))
         
-        for idx, label in enumerate(sorted(unique_labels)):
-            if label == -1:
-                # Noise points (DBSCAN)
-                color = 'gray'
-                marker = 'x'
-                label_text = 'Noise'
+        unique_labels = sorted(set(labels.tolist()))
+        cluster_labels = [label for label in unique_labels if label != -1]
+        colors = sns.color_palette("husl", len(cluster_labels))
+        color_of = dict(zip(cluster_labels, colors))
+        color_of[-1] = 'gray'
+        
+        if mode == 'density':
+            points_drawn = 0
+            self._draw_cluster_density(ax, X_reduced, labels, unique_labels, color_of)
+        else:
+            if mode == 'sample':
+                keep = self._stratified_indices(labels, max_points, random_state)
+            elif mode == 'scatter':
+                keep = np.arange(n_points)
             else:
-                color = colors[label]
-                marker = 'o'
-                label_text = f'Cluster {label}'
+                raise ValueError(f"Unknown 2D plot mode: {mode}")
+            
+            points_drawn = len(keep)
+            X_kept, labels_kept = X_reduced[keep], labels[keep]
+            large = mode == 'sample'
             
-            mask = labels == label
-            ax.scatter(X_reduced[mask, 0], X_reduced[mask, 1], 
-                      c=[color], label=label_text, 
-                      alpha=0.6, s=100, marker=marker, edgecolors='black', linewidth=0.5)
+            # With many points, draw noise last so it is not hidden under clusters
+            draw_order = unique_labels
+            if large and -1 in unique_labels:
+                draw_order = cluster_labels + [-1]
+            
+            for label in draw_order:
+                mask = labels_kept == label
+                if label == -1:
+                    # Noise points (DBSCAN)
+                    marker, label_text = 'x', 'Noise'
+                else:
+                    marker, label_text = 'o', f'Cluster {label}'
+                
+                if large:
+                    # Small rasterized markers keep large plots fast and PNGs small
+                    ax.scatter(X_kept[mask, 0], X_kept[mask, 1],
+                               c=[color_of[label]], label=label_text,
+                               alpha=0.5, s=8, marker=marker, rasterized=True,
+                               linewidths=0.8 if label == -1 else 0)
+                else:
+                    ax.scatter(X_kept[mask, 0], X_kept[mask, 1], 
+                              c=[color_of[label]], label=label_text, 
+                              alpha=0.6, s=100, marker=marker, edgecolors='black', linewidth=0.5)
         
         ax.set_xlabel('Component 1', fontsize=12)
         ax.set_ylabel('Component 2', fontsize=12)
@@ -79,7 +127,55 @@ class ClusterVisualizer:
         
         plt.tight_layout()
         
-        return self._fig_to_base64(fig)
+        image = self._fig_to_base64(fig)
+        if return_info:
+            return image, {'mode': mode, 'total_points': n_points, 'points_drawn': points_drawn}
+        return image
+    
+    def _stratified_indices(self, labels, max_points, random_state=42, min_per_label=200):
+        """
+        Indices of a per-label proportional sample of about max_points rows.
+        Every label keeps at least min(min_per_label, label size) points.
+        """
+        rng = np.random.RandomState(random_state)
+        unique_labels, codes, sizes = np.unique(labels, return_inverse=True, return_counts=True)
+        quotas = np.round(max_points * sizes / len(labels)).astype(int)
+        quotas = np.minimum(np.maximum(quotas, min_per_label), sizes)
+        
+        # Random rank within each label; keep the first quota points of each
+        order = np.lexsort((rng.random_sample(len(labels)), codes))
+        starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        rank = np.empty(len(labels), dtype=int)
+        rank[order] = np.arange(len(labels)) - np.repeat(starts, sizes)
+        
+        return np.flatnonzero(rank < quotas[codes])
+    
+    def _draw_cluster_density(self, ax, X_reduced, labels, unique_labels, color_of, bins=200):
+        """Draw clusters as a density image colored by the dominant cluster per bin."""
+        x_edges = np.linspace(X_reduced[:, 0].min(), X_reduced[:, 0].max(), bins + 1)
+        y_edges = np.linspace(X_reduced[:, 1].min(), X_reduced[:, 1].max(), bins + 1)
+        
+        counts = np.stack([
+            np.histogram2d(X_reduced[labels == label, 0], X_reduced[labels == label, 1],
+                           bins=[x_edges, y_edges])[0]
+            for label in unique_labels
+        ])
+        
+        dominant = counts.argmax(axis=0)
+        density = np.log1p(counts.sum(axis=0))
+        
+        palette = np.array([matplotlib.colors.to_rgb(color_of[label]) for label in unique_labels])
+        image = np.zeros((bins, bins, 4))
+        image[..., :3] = palette[dominant]
+        image[..., 3] = density / max(density.max(), 1e-10)
+        
+        # histogram2d is indexed [x, y]; imshow expects [row=y, col=x]
+        ax.imshow(image.transpose(1, 0, 2), origin='lower', aspect='auto', interpolation='nearest',
+                  extent=[x_edges[0], x_edges[-1], y_edges[0], y_edges[-1]])
+        
+        for label in unique_labels:
+            label_text = 'Noise' if label == -1 else f'Cluster {label}'
+            ax.scatter([], [], c=[color_of[label]], label=label_text, marker='s')
     
     def plot_feature_distributions(self, df, feature_names, labels):
         """Plot distribution of features across clusters."""
@@ -190,6 +286,33 @@ class ClusterVisualizer:
         
         return self._fig_to_base64(fig)
     
+    def render_plot(self, plot_name, X, labels, feature_names, X_reduced=None,
+                    profiles_df=None, title=None, mode='auto', max_points=20000):
+        """
+        Render a single named plot for a clustering result.
+        Returns (image, info); info is only filled in for clusters_2d.
+        """
+        if plot_name == 'clusters_2d':
+            if X_reduced is None:
+                raise ValueError("clusters_2d needs a 2D projection")
+            return self.plot_clusters_2d(X_reduced, labels,
+                                         title or "Customer Segments (2D Projection)",
+                                         mode=mode, max_points=max_points, return_info=True)
+        return self._render_result_plot(plot_name, X, labels, feature_names, profiles_df), {}
+    
+    def _render_result_plot(self, plot_name, X, labels, feature_names, profiles_df):
+        if plot_name == 'feature_distributions':
+            return self.plot_feature_distributions(pd.DataFrame(X, columns=feature_names),
+                                                   feature_names, labels)
+        if plot_name == 'cluster_profiles':
+            if profiles_df is None:
+                raise ValueError("cluster_profiles needs cluster profiles")
+            return self.plot_cluster_profiles(profiles_df, feature_names)
+        if plot_name == 'correlation_heatmap':
+            return self.plot_correlation_heatmap(pd.DataFrame(X, columns=feature_names),
+                                                 feature_names)
+        raise ValueError(f"Unknown plot: {plot_name}")
+    
     def _fig_to_base64(self, fig):
         """Convert matplotlib figure to base64 string."""
         buf = BytesIO()
@@ -200,30 +323,90 @@ class ClusterVisualizer:
         return img_base64
     
     def generate_summary_plots(self, X, labels, feature_names, X_reduced=None, 
-                              elbow_data=None, profiles_df=None):
-        """Generate all summary visualizations."""
-        plots = {}
-        
+                              elbow_data=None, profiles_df=None, render_info=None,
+                              render_pool=None):
+        """
+        Generate all summary visualizations.
+        If a render_info dict is given, it receives the 2D plot's render info.
+        With a PlotRenderPool the independent figures render concurrently in
+        worker processes; otherwise they render one after another here.
+        """
         # Convert to DataFrame
         df = pd.DataFrame(X, columns=feature_names)
         
+        # Each task is (method name, args, kwargs)
+        tasks = {}
+        
         # Elbow curve (if provided)
         if elbow_data:
-            plots['elbow_curve'] = self.plot_elbow_curve(elbow_data)
+            tasks['elbow_curve'] = ('plot_elbow_curve', (elbow_data,), {})
         
         # 2D cluster visualization
         if X_reduced is not None:
-            plots['clusters_2d'] = self.plot_clusters_2d(X_reduced, labels, 
-                                                         "Customer Segments (2D Projection)")
+            tasks['clusters_2d'] = ('plot_clusters_2d',
+                                    (X_reduced, labels, "Customer Segments (2D Projection)"),
+                                    {'return_info': True})
         
         # Feature distributions
-        plots['feature_distributions'] = self.plot_feature_distributions(df, feature_names, labels)
+        tasks['feature_distributions'] = ('plot_feature_distributions', (df, feature_names, labels), {})
         
         # Cluster profiles
         if profiles_df is not None:
-            plots['cluster_profiles'] = self.plot_cluster_profiles(profiles_df, feature_names)
+            tasks['cluster_profiles'] = ('plot_cluster_profiles', (profiles_df, feature_names), {})
         
         # Correlation heatmap
-        plots['correlation_heatmap'] = self.plot_correlation_heatmap(df, feature_names)
+        tasks['correlation_heatmap'] = ('plot_correlation_heatmap', (df, feature_names), {})
+        
+        if render_pool is not None:
+            plots = render_pool.render(tasks)
+        else:
+            plots = {name: getattr(self, method)(*args, **kwargs)
+                     for name, (method, args, kwargs) in tasks.items()}
+        
+        if 'clusters_2d' in plots:
+            plots['clusters_2d'], info = plots['clusters_2d']
+            if render_info is not None:
+                render_info['clusters_2d'] = info
         
         return plots
+
+# Visualizer owned by each render worker process
+_worker_visualizer = None
+
+def _init_render_worker():
+    """Pre-warm a render process: build the visualizer and render a throwaway figure."""
+    global _worker_visualizer
+    _worker_visualizer = ClusterVisualizer()
+    fig, ax = plt.subplots(figsize=(1, 1))
+    ax.plot([0, 1], [0, 1])
+    _worker_visualizer._fig_to_base64(fig)
+
+def _render_task(method, args, kwargs):
+    return getattr(_worker_visualizer, method)(*args, **kwargs)
+
+class PlotRenderPool:
+    """
+    Pool of pre-warmed processes for rendering figures concurrently.
+    
+    pyplot keeps global state, so figures cannot be rendered safely from
+    several threads; each worker process has its own pyplot with matplotlib
+    and seaborn already imported and styled. Inputs and PNG strings travel
+    through the pool's pipes.
+    """
+    
+    def __init__(self, n_workers=None, start_method='spawn'):
+        self.n_workers = n_workers or min(5, os.cpu_count() or 1)
+        context = multiprocessing.get_context(start_method)
+        # multiprocessing.Pool starts every worker (and runs the initializer) up front
+        self._pool = context.Pool(processes=self.n_workers, initializer=_init_render_worker)
+    
+    def render(self, tasks):
+        """Render {name: (method, args, kwargs)} tasks concurrently; returns {name: result}."""
+        pending = {name: self._pool.apply_async(_render_task, task)
+                   for name, task in tasks.items()}
+        return {name: result.get() for name, result in pending.items()}
+    
+    def close(self):
+        """Stop the worker processes."""
+        self._pool.terminate()
+        self._pool.join()